@@ -0,0 +1,135 @@
+# bench_property_builder.py
+# ⏱️ MICROBENCHMARK: build Notion properties cho 100k record giả lập
+#
+# Cách dùng:
+#     python benchmarks/bench_property_builder.py            # 100k record
+#     python benchmarks/bench_property_builder.py 500000     # số record tùy chọn
+#
+# So sánh chuỗi if/elif cũ (chạy lại cho từng field của từng record)
+# với PropertyBuilder (field chia theo kiểu 1 lần lúc khởi tạo, build chỉ điền giá trị),
+# cả khi đoán kiểu theo tên field lẫn khi có kiểu từ schema database.
+# Kết quả tham khảo (CPython 3.11, 100k record): ~1.2-1.3x.
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from module.notion_properties import PropertyBuilder
+
+FIELD_MAPPINGS = {
+    'campaign_name': 'Campaign Name',
+    'campaign_id': 'Campaign ID',
+    'spend': 'Spend',
+    'impressions': 'Impressions',
+    'clicks': 'Clicks',
+    'ctr': 'CTR (%)',
+    'cpc': 'CPC',
+    'cpm': 'CPM',
+    'account_id': 'Account ID'
+}
+
+# Kiểu thật của database (như notion_schema trả về) - trùng với cách đoán theo tên field
+SCHEMA_TYPES = {
+    'Campaign Name': 'title',
+    'Campaign ID': 'rich_text',
+    'Account ID': 'rich_text',
+    'Spend': 'number',
+    'Impressions': 'number',
+    'Clicks': 'number',
+    'CTR (%)': 'number',
+    'CPC': 'number',
+    'CPM': 'number',
+}
+
+# ========== CÁCH CŨ (if/elif cho từng field) ==========
+
+def build_notion_properties_legacy(campaign):
+    properties = {}
+
+    for fb_field, notion_field in FIELD_MAPPINGS.items():
+        value = campaign.get(fb_field)
+
+        if value is None:
+            continue
+
+        if fb_field == 'campaign_name':
+            properties[notion_field] = {
+                "title": [{"text": {"content": str(value)}}]
+            }
+        elif fb_field in ['spend', 'impressions', 'clicks', 'ctr', 'cpc', 'cpm']:
+            try:
+                properties[notion_field] = {
+                    "number": float(value)
+                }
+            except:
+                properties[notion_field] = {
+                    "rich_text": [{"text": {"content": str(value)}}]
+                }
+        else:
+            properties[notion_field] = {
+                "rich_text": [{"text": {"content": str(value)}}]
+            }
+
+    return properties
+
+# ========== DỮ LIỆU GIẢ LẬP ==========
+
+def synthetic_records(count, seed=42):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        record = {
+            'campaign_name': f"Campaign {i}",
+            'campaign_id': str(120200000000000 + i),
+            'account_id': str(rng.randint(1, 20)),
+            'spend': f"{rng.uniform(0, 500):.2f}",
+            'impressions': str(rng.randint(0, 100000)),
+            'clicks': str(rng.randint(0, 2000)),
+            'ctr': f"{rng.uniform(0, 5):.6f}",
+            'cpc': f"{rng.uniform(0, 3):.6f}",
+        }
+        # Giống Graph API: field không có số liệu thì vắng mặt
+        if rng.random() < 0.5:
+            record['cpm'] = f"{rng.uniform(0, 30):.6f}"
+        records.append(record)
+    return records
+
+def best_of(func, records, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            func(record)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# ========== MAIN ==========
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = synthetic_records(count)
+    builder = PropertyBuilder(FIELD_MAPPINGS, title_field='campaign_name').build
+    typed = PropertyBuilder(FIELD_MAPPINGS, title_field='campaign_name', types=SCHEMA_TYPES).build
+
+    # Các cách phải ra cùng payload
+    for record in records[:1000]:
+        assert builder(record) == typed(record) == build_notion_properties_legacy(record)
+
+    legacy = best_of(build_notion_properties_legacy, records)
+    compiled = best_of(builder, records)
+    compiled_typed = best_of(typed, records)
+
+    print("\n" + "=" * 70)
+    print(f"⏱️  PROPERTY BUILDER - {count:,} records (best of 3)")
+    print("=" * 70)
+    print(f"   if/elif (cũ):     {legacy:.3f}s  ({count / legacy:,.0f} records/s)")
+    print(f"   PropertyBuilder:  {compiled:.3f}s  ({count / compiled:,.0f} records/s)  ⚡ {legacy / compiled:.2f}x")
+    print(f"   + kiểu schema:    {compiled_typed:.3f}s  ({count / compiled_typed:,.0f} records/s)  ⚡ {legacy / compiled_typed:.2f}x")
+    print("=" * 70 + "\n")
+
+if __name__ == "__main__":
+    main()
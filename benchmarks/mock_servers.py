@@ -0,0 +1,411 @@
+# mock_servers.py
+# 🧪 MOCK NOTION + GRAPH API chạy trong process (chỉ dùng cho benchmark)
+#
+# Một HTTP server (keep-alive, nhiều thread) phục vụ:
+#     /notion/...  databases/{id}, databases/{id}/query, search, pages, pages/{id}
+#     /graph/...   act_{id}/insights (phân trang paging.next như Graph API), POST / batch (tối đa 50)
+#                  level=account hoặc level=campaign (campaigns_per_account campaign mỗi account)
+# Cấu hình được độ trễ, kích thước trang và tỷ lệ 429 (kèm Retry-After).
+# Query database hiểu filter đơn giản: and/or, title/rich_text equals, date on_or_after/on_or_before.
+
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Schema database daily (giống NOTION_DATABASE_ID_DAILY thật)
+DAILY_SCHEMA = {
+    'Account ID': 'title',
+    'Date': 'date',
+    'Spend': 'number',
+    'Impressions': 'number',
+    'Clicks': 'number',
+    'CTR': 'number',
+    'CPC': 'number',
+}
+
+# Database fact campaign × ngày và 2 bảng tổng hợp của nó (rollups)
+FACT_SCHEMA = {
+    'Campaign Name': 'title',
+    'Account ID': 'rich_text',
+    'Campaign ID': 'rich_text',
+    'Date': 'date',
+    'Spend': 'number',
+    'Impressions': 'number',
+    'Clicks': 'number',
+    'CTR': 'number',
+    'CPC': 'number',
+}
+CAMPAIGN_SCHEMA = {
+    'Campaign Name': 'title',
+    'Campaign ID': 'rich_text',
+    'Account ID': 'rich_text',
+    'Spend': 'number',
+    'Impressions': 'number',
+    'Clicks': 'number',
+    'CTR (%)': 'number',
+    'CPC': 'number',
+}
+
+# ========== DỮ LIỆU GIẢ LẬP ==========
+
+def synthetic_insight(account_id, day, rng):
+    """1 record insights level=account, time_increment=1 (giá trị dạng chuỗi như Graph API)"""
+    impressions = rng.randint(100, 100000)
+    clicks = rng.randint(0, impressions // 20)
+    spend = rng.uniform(1, 500)
+    return {
+        'account_id': account_id,
+        'date_start': day,
+        'date_stop': day,
+        'spend': f"{spend:.2f}",
+        'impressions': str(impressions),
+        'clicks': str(clicks),
+        'ctr': f"{(100 * clicks / impressions):.6f}",
+        'cpc': f"{(spend / clicks if clicks else 0):.6f}",
+    }
+
+def synthetic_campaign_insight(account_id, campaign, day, rng):
+    """1 record level=campaign, time_increment=1"""
+    record = synthetic_insight(account_id, day, rng)
+    record['campaign_id'] = f"{account_id}{campaign:03d}"
+    record['campaign_name'] = f"Campaign {campaign} ({account_id})"
+    return record
+
+def synthetic_properties(index, rng):
+    """Payload properties của 1 dòng daily (như PropertyBuilder tạo ra)"""
+    day = (date(2020, 1, 1) + timedelta(days=index % 3650)).isoformat()
+    record = synthetic_insight(str(1000 + index // 3650), day, rng)
+    return {
+        'Account ID': {'title': [{'text': {'content': record['account_id']}}]},
+        'Date': {'date': {'start': day}},
+        'Spend': {'number': float(record['spend'])},
+        'Impressions': {'number': float(record['impressions'])},
+        'Clicks': {'number': float(record['clicks'])},
+        'CTR': {'number': float(record['ctr'])},
+        'CPC': {'number': float(record['cpc'])},
+    }
+
+def to_response_properties(properties):
+    """Payload ghi -> dạng property Notion trả về (có type, plain_text)"""
+    result = {}
+    for name, prop in properties.items():
+        prop_type = next(iter(prop))
+        value = prop[prop_type]
+        if prop_type in ('title', 'rich_text'):
+            value = [{'type': 'text', 'text': item['text'], 'plain_text': item['text']['content']} for item in value]
+        result[name] = {'id': name[:4], 'type': prop_type, prop_type: value}
+    return result
+
+def plain_value(prop):
+    """Giá trị so sánh được của 1 property dạng response (text hoặc ngày bắt đầu)"""
+    value = prop.get(prop['type'])
+    if prop['type'] in ('title', 'rich_text'):
+        return ''.join(item['plain_text'] for item in value)
+    if prop['type'] == 'date':
+        return (value or {}).get('start')
+    return value
+
+def matches_filter(page, query_filter):
+    """Page có khớp filter query Notion (tập con đủ cho benchmark) không"""
+    if not query_filter:
+        return True
+    if 'and' in query_filter:
+        return all(matches_filter(page, item) for item in query_filter['and'])
+    if 'or' in query_filter:
+        return any(matches_filter(page, item) for item in query_filter['or'])
+    prop = page['properties'].get(query_filter['property'])
+    if prop is None:
+        return False
+    value = plain_value(prop)
+    condition = next(value for key, value in query_filter.items() if key != 'property')
+    if 'equals' in condition:
+        return value == condition['equals']
+    if value is None:
+        return False
+    if 'on_or_after' in condition and value < condition['on_or_after']:
+        return False
+    if 'on_or_before' in condition and value > condition['on_or_before']:
+        return False
+    return True
+
+# ========== MOCK SERVER ==========
+
+class MockOptions:
+    """latency_ms ± jitter_ms mỗi request; rate_429: xác suất trả 429 (Retry-After = retry_after giây)
+
+    keep_pages=False: page tạo qua HTTP không được lưu (đo bộ nhớ phía client không lẫn dữ liệu mock).
+    batch_error_rate: xác suất 1 sub-request trong Graph batch trả lỗi 500.
+    campaigns_per_account: số campaign mỗi account mỗi ngày khi level=campaign.
+    batch_throttle_rate: xác suất 1 sub-request bị throttle (lỗi 80004 + X-Business-Use-Case-Usage
+    với estimated_time_to_regain_access = throttle_regain_minutes).
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, retry_after=0.1, graph_page_size=25, seed=42,
+                 keep_pages=True, batch_error_rate=0.0, campaigns_per_account=3, batch_throttle_rate=0.0,
+                 throttle_regain_minutes=0.01):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.graph_page_size = graph_page_size
+        self.seed = seed
+        self.keep_pages = keep_pages
+        self.batch_error_rate = batch_error_rate
+        self.campaigns_per_account = campaigns_per_account
+        self.batch_throttle_rate = batch_throttle_rate
+        self.throttle_regain_minutes = throttle_regain_minutes
+
+
+class MockApiServer:
+    """Notion + Graph API giả lập, dữ liệu Notion giữ trong bộ nhớ
+
+    Database mặc định (database_id) có schema daily; add_database thêm database khác.
+    """
+
+    def __init__(self, options=None, database_id='benchdb'):
+        self.options = options or MockOptions()
+        self.database_id = database_id
+        self.schemas = {database_id: DAILY_SCHEMA}
+        self.pages = {}
+        self.order = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.rng = random.Random(self.options.seed)
+        self.counts = {'requests': 0, 'throttled': 0, 'batch_requests': 0, 'batch_throttled': 0}
+        self._server = None
+
+    # ---------- Dữ liệu ----------
+
+    def add_database(self, database_id, schema):
+        self.schemas[database_id] = schema
+        return database_id
+
+    def _new_page(self, properties, converted=False, keep=True, database_id=None):
+        page_id = f"{next(self.ids):08x}-0000-4000-8000-{self.rng.getrandbits(48):012x}"
+        page = {
+            'object': 'page',
+            'id': page_id,
+            'parent': {'type': 'database_id', 'database_id': database_id or self.database_id},
+            'archived': False,
+            'properties': properties if converted else to_response_properties(properties),
+        }
+        if keep:
+            self.pages[page_id] = page
+            self.order.append(page_id)
+        return page
+
+    def seed(self, count):
+        """Tạo sẵn count page (không qua HTTP) cho benchmark update/query/archive"""
+        rng = random.Random(self.options.seed)
+        with self.lock:
+            for index in range(count):
+                self._new_page(to_response_properties(synthetic_properties(index, rng)), converted=True)
+        return list(self.order[-count:])
+
+    def live_count(self):
+        with self.lock:
+            return sum(1 for page in self.pages.values() if not page['archived'])
+
+    # ---------- Server ----------
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Header và body được ghi riêng -> tắt Nagle để không dính delayed ACK ~40ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self, 'GET')
+
+            def do_POST(self):
+                server._handle(self, 'POST')
+
+            def do_PATCH(self):
+                server._handle(self, 'PATCH')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _send(self, handler, status, body, headers=None):
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle(self, handler, method):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        if handler.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            payload = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        else:
+            payload = json.loads(body or b'{}') if body else {}
+        url = urlparse(handler.path)
+        options = self.options
+
+        with self.lock:
+            self.counts['requests'] += 1
+            throttle = options.rate_429 > 0 and self.rng.random() < options.rate_429
+            delay = max(0.0, options.latency_ms + self.rng.uniform(-options.jitter_ms, options.jitter_ms)) / 1000
+            if throttle:
+                self.counts['throttled'] += 1
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            return self._send(handler, 429, {'object': 'error', 'status': 429, 'code': 'rate_limited'},
+                              {'Retry-After': str(options.retry_after)})
+
+        parts = [part for part in url.path.split('/') if part]
+        if parts and parts[0] == 'notion':
+            status, body = self._notion(method, parts[1:], payload)
+        elif parts == ['graph'] and method == 'POST':
+            status, body = self._graph_batch(payload)
+        elif parts and parts[0] == 'graph':
+            status, body = self._graph(parts[1:], parse_qs(url.query))
+        else:
+            status, body = 404, {'message': 'not found'}
+        self._send(handler, status, body)
+
+    # ---------- Notion ----------
+
+    def _notion(self, method, parts, payload):
+        if parts[:1] == ['databases'] and len(parts) == 2 and method == 'GET':
+            return 200, {
+                'object': 'database',
+                'id': parts[1],
+                'properties': {
+                    name: {'id': name[:4], 'type': kind}
+                    for name, kind in self.schemas.get(parts[1], DAILY_SCHEMA).items()
+                },
+            }
+        if parts[:1] == ['databases'] and parts[2:] == ['query']:
+            query_filter = payload.get('filter')
+            return 200, self._page_list(payload, lambda page: (
+                not page['archived'] and page['parent']['database_id'] == parts[1] and matches_filter(page, query_filter)
+            ))
+        if parts == ['search']:
+            return 200, self._page_list(payload, lambda page: not page['archived'])
+        if parts == ['pages'] and method == 'POST':
+            with self.lock:
+                page = self._new_page(payload.get('properties', {}), keep=self.options.keep_pages,
+                                      database_id=payload.get('parent', {}).get('database_id'))
+            return 200, page
+        if parts[:1] == ['pages'] and len(parts) == 2 and method == 'PATCH':
+            with self.lock:
+                page = self.pages.get(parts[1])
+                if page is None:
+                    return 404, {'object': 'error', 'status': 404, 'code': 'object_not_found'}
+                if payload.get('archived'):
+                    page['archived'] = True
+                if payload.get('properties'):
+                    page['properties'].update(to_response_properties(payload['properties']))
+            return 200, page
+        return 404, {'object': 'error', 'status': 404, 'code': 'invalid_request_url'}
+
+    def _page_list(self, payload, keep):
+        """Phân trang theo start_cursor (vị trí trong danh sách), tối đa page_size (≤100)"""
+        page_size = min(100, int(payload.get('page_size', 100)))
+        position = int(payload.get('start_cursor') or 0)
+        results = []
+        with self.lock:
+            while position < len(self.order) and len(results) < page_size:
+                page = self.pages[self.order[position]]
+                position += 1
+                if keep(page):
+                    results.append(page)
+            has_more = position < len(self.order)
+        return {'object': 'list', 'results': results, 'has_more': has_more,
+                'next_cursor': str(position) if has_more else None}
+
+    # ---------- Graph API ----------
+
+    def _graph_batch(self, payload):
+        """POST / batch=[{method, relative_url}]: mỗi sub-request -> {code, headers?, body (chuỗi JSON)}"""
+        batch = json.loads(payload.get('batch') or '[]')
+        include_headers = payload.get('include_headers', 'true') != 'false'
+        options = self.options
+        if len(batch) > 50:
+            return 400, {'error': {'message': 'Too many requests in batch', 'code': 1}}
+        results = []
+        for item in batch:
+            relative = urlparse(item['relative_url'])
+            parts = [part for part in relative.path.split('/') if part]
+            account = parts[0] if parts else ''
+            with self.lock:
+                self.counts['batch_requests'] += 1
+                fail = options.batch_error_rate > 0 and self.rng.random() < options.batch_error_rate
+                throttle = options.batch_throttle_rate > 0 and self.rng.random() < options.batch_throttle_rate
+                if throttle:
+                    self.counts['batch_throttled'] += 1
+            headers = {'X-Ad-Account-Usage': json.dumps({'acc_id_util_pct': 1.0})}
+            if throttle:
+                status, body = 400, {'error': {'message': 'User request limit reached', 'code': 80004}}
+                headers['X-Business-Use-Case-Usage'] = json.dumps({account[4:]: [{
+                    'type': 'ads_insights', 'call_count': 100, 'total_cputime': 10, 'total_time': 10,
+                    'estimated_time_to_regain_access': options.throttle_regain_minutes,
+                }]})
+            elif fail:
+                status, body = 500, {'error': {'message': 'Unknown error', 'code': 1}}
+            else:
+                status, body = self._graph(parts, parse_qs(relative.query))
+            result = {'code': status, 'body': json.dumps(body)}
+            if include_headers:
+                result['headers'] = [{'name': name, 'value': value} for name, value in headers.items()]
+            results.append(result)
+        return 200, results
+
+    def _graph(self, parts, query):
+        if len(parts) != 2 or not parts[0].startswith('act_') or parts[1] != 'insights':
+            return 400, {'error': {'message': 'Unsupported request', 'code': 100}}
+        account_id = parts[0][4:]
+        since = date.fromisoformat(query['time_range[since]'][0])
+        until = date.fromisoformat(query['time_range[until]'][0])
+        days = [since + timedelta(days=offset) for offset in range((until - since).days + 1)]
+        campaign_level = query.get('level', [''])[0] == 'campaign'
+        # level=campaign: mỗi ngày campaigns_per_account dòng
+        rows = [(day, campaign) for day in days for campaign in range(self.options.campaigns_per_account)] \
+            if campaign_level else [(day, None) for day in days]
+        offset = int(query.get('after', ['0'])[0])
+        page_rows = rows[offset:offset + self.options.graph_page_size]
+
+        rng = random.Random(f"{account_id}{offset}{since}")
+        body = {'data': [
+            synthetic_insight(account_id, day.isoformat(), rng) if campaign is None
+            else synthetic_campaign_insight(account_id, campaign, day.isoformat(), rng)
+            for day, campaign in page_rows
+        ]}
+        next_offset = offset + len(page_rows)
+        if next_offset < len(rows):
+            params = {key: values[0] for key, values in query.items() if key != 'after'}
+            params['after'] = str(next_offset)
+            query_string = '&'.join(f"{key}={value}" for key, value in params.items())
+            body['paging'] = {'next': f"{self.base_url}/graph/{parts[0]}/insights?{query_string}"}
+        return 200, body
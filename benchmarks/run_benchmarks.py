@@ -0,0 +1,380 @@
+# run_benchmarks.py
+# ⏱️ BENCHMARK: create / update / query / archive / sync với mock Notion + Graph API
+#
+# Cách dùng:
+#     python benchmarks/run_benchmarks.py                                  # 1k, 10k, 100k
+#     python benchmarks/run_benchmarks.py --sizes 1000 --ops create,query
+#     python benchmarks/run_benchmarks.py --latency-ms 150 --jitter-ms 50 --rate-429 0.02 --notion-rate 3
+#     python benchmarks/run_benchmarks.py --json results.json
+#     python benchmarks/run_benchmarks.py --ops stream --sizes 1000,100000,1000000   # peak RSS theo số dòng
+#     python benchmarks/run_benchmarks.py --ops graph_page --sizes 1000,100000         # 1 trang Graph nhiều MB
+#
+# Mỗi (thao tác, số dòng) chạy trong 1 process riêng để đo peak RSS chính xác
+# (peak RSS gồm cả bộ nhớ của mock server trong cùng process; op stream không lưu page
+# được tạo trong mock nên peak RSS gần như chỉ còn phía client).
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OPS = ['create', 'update', 'query', 'archive', 'clear_script', 'clear_scoped', 'sync', 'sync_batch', 'sync_fact', 'stream', 'graph_page']
+DEFAULT_SIZES = [1000, 10000, 100000]
+LATENCY_SAMPLES = 100000
+
+# ========== ĐO ĐẠC ==========
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# ========== CÁC THAO TÁC ==========
+
+def run_create(mock, size, args):
+    from benchmarks.mock_servers import synthetic_properties
+    from module.notion_writer import NotionWriter
+    import random
+    rng = random.Random(1)
+    with NotionWriter('bench', max_workers=args.workers) as writer:
+        for index in range(size):
+            writer.create_page(mock.database_id, synthetic_properties(index, rng), str(index))
+    return writer.stats['created'], writer.stats['failed']
+
+def run_update(mock, size, args):
+    from benchmarks.mock_servers import synthetic_properties
+    from module.notion_writer import NotionWriter
+    import random
+    page_ids = mock.seed(size)
+    rng = random.Random(2)
+    with NotionWriter('bench', max_workers=args.workers) as writer:
+        for index, page_id in enumerate(page_ids):
+            writer.update_page(page_id, synthetic_properties(index, rng), str(index))
+    return writer.stats['updated'], writer.stats['failed']
+
+def run_query(mock, size, args):
+    from module.notion_query import iter_database_pages
+    mock.seed(size)
+    count = sum(1 for _ in iter_database_pages(mock.database_id, notion_api_key='bench'))
+    return count, size - count
+
+def run_archive(mock, size, args):
+    from module.notion_database_clearer import NotionDatabaseClearer
+    mock.seed(size)
+    result = NotionDatabaseClearer('bench').clear_database_parallel(mock.database_id, max_workers=args.workers)
+    return result['deleted_pages'], result['failed_pages']
+
+def run_clear_script(mock, size, args):
+    mock.seed(size)
+    import clear_notion_database as script
+    return script.delete_all_pages_parallel()
+
+def run_clear_scoped(mock, size, args):
+    # Re-sync 1 account trong 1 tháng: chỉ ~31 dòng bị xóa dù database có size dòng
+    from module.notion_database_clearer import NotionDatabaseClearer, scope_filter
+    mock.seed(size)
+    query_filter = scope_filter(mock.database_id, ['1000'], '2020-01-01', '2020-01-31', notion_api_key='bench')
+    result = NotionDatabaseClearer('bench').clear_database(
+        mock.database_id, max_workers=args.workers, query_filter=query_filter
+    )
+    return result['deleted_pages'], result['failed_pages']
+
+def sync_config(mock, size, args):
+    from module.sync_config import SyncConfig
+    from datetime import date, timedelta
+    # Mỗi account tối đa 1000 ngày -> size dòng daily
+    accounts = max(1, -(-size // 1000))
+    days = -(-size // accounts)
+    start = date(2020, 1, 1)
+    return SyncConfig(
+        title='BENCHMARK SYNC',
+        database_id=mock.database_id,
+        key_properties=['Account ID', 'Date'],
+        level='account',
+        facebook_fields=['spend', 'impressions', 'clicks', 'ctr', 'cpc'],
+        field_mappings={'spend': 'Spend', 'impressions': 'Impressions', 'clicks': 'Clicks', 'ctr': 'CTR', 'cpc': 'CPC'},
+        account_ids=[str(1000 + index) for index in range(accounts)],
+        access_token='bench',
+        notion_api_key='bench',
+        start_date=start.isoformat(),
+        end_date=(start + timedelta(days=days - 1)).isoformat(),
+        fixed_properties=[('Account ID', 'account_id', 'title'), ('Date', 'date_start', 'date')],
+        time_increment=1,
+        window_days=args.window_days,
+    )
+
+def run_sync(mock, size, args):
+    from module.pipeline import run_pipeline
+    stats = run_pipeline(sync_config(mock, size, args)) or {}
+    return stats.get('created', 0) + stats.get('updated', 0), stats.get('failed', 0)
+
+def run_sync_batch(mock, size, args):
+    # Như sync nhưng request insights gộp thành Graph batch 50 sub-request
+    from module.pipeline import run_pipeline
+    config = sync_config(mock, size, args)
+    config.graph_batch_size = 50
+    stats = run_pipeline(config) or {}
+    return stats.get('created', 0) + stats.get('updated', 0), stats.get('failed', 0)
+
+def run_sync_fact(mock, size, args):
+    # size dòng campaign × ngày, 1 lượt Graph; daily + tổng campaign tính cục bộ (rollups)
+    from benchmarks.mock_servers import CAMPAIGN_SCHEMA, FACT_SCHEMA
+    from module.pipeline import run_pipeline
+    from module.sync_config import SyncConfig
+    campaigns = mock.options.campaigns_per_account
+    config = sync_config(mock, -(-size // campaigns), args)
+    daily = sync_config(mock, -(-size // campaigns), args)
+    fact_mappings = {'campaign_name': 'Campaign Name', 'spend': 'Spend', 'impressions': 'Impressions',
+                     'clicks': 'Clicks', 'ctr': 'CTR', 'cpc': 'CPC'}
+    config.database_id = mock.add_database('benchfact', FACT_SCHEMA)
+    config.level = 'campaign'
+    config.key_properties = ['Account ID', 'Campaign ID', 'Date']
+    config.facebook_fields = ['campaign_name', 'campaign_id', 'spend', 'impressions', 'clicks', 'ctr', 'cpc']
+    config.field_mappings = fact_mappings
+    config.title_field = 'campaign_name'
+    config.fixed_properties = [('Account ID', 'account_id', 'rich_text'), ('Campaign ID', 'campaign_id', 'rich_text'),
+                               ('Date', 'date_start', 'date')]
+    config.rollups = {
+        'daily': daily,
+        'campaign': SyncConfig(
+            title='BENCHMARK CAMPAIGN TOTALS',
+            database_id=mock.add_database('benchcampaign', CAMPAIGN_SCHEMA),
+            key_properties=['Campaign ID'],
+            level='campaign',
+            facebook_fields=[],
+            field_mappings={'campaign_name': 'Campaign Name', 'campaign_id': 'Campaign ID', 'account_id': 'Account ID',
+                            'spend': 'Spend', 'impressions': 'Impressions', 'clicks': 'Clicks',
+                            'ctr': 'CTR (%)', 'cpc': 'CPC'},
+            account_ids=[],
+            access_token='bench',
+            notion_api_key='bench',
+            start_date=config.start_date,
+            end_date=config.end_date,
+            title_field='campaign_name',
+            archive_stale=False,
+        ),
+    }
+    stats = run_pipeline(config) or {}
+    return (
+        sum(stats.get(key, 0) for key in ('created', 'updated', 'rollup_daily_created', 'rollup_daily_updated',
+                                          'rollup_campaign_created', 'rollup_campaign_updated')),
+        stats.get('failed', 0) + stats.get('rollup_daily_failed', 0) + stats.get('rollup_campaign_failed', 0),
+    )
+
+def run_stream(mock, size, args):
+    # Như sync nhưng mock không giữ page: peak RSS phải gần như không đổi từ 1k tới 1M dòng
+    mock.options.keep_pages = False
+    return run_sync(mock, size, args)
+
+def run_graph_page(mock, size, args):
+    # 1 trang Insights size record (100k ~ 23MB) phục vụ từ file tĩnh ở process khác, để peak RSS
+    # chỉ còn phía client: body phải được giải mã dần kể cả khi hook metrics đang bật
+    import random
+    import socket
+    import urllib.request
+    from benchmarks.mock_servers import synthetic_insight
+    from module.facebook_insights import _iter_pages
+    from module.http_transport import get_graph_transport
+    from module.metrics import get_metrics
+
+    get_metrics()
+    path = os.path.join(os.getcwd(), 'page', 'act_1')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = random.Random(0)
+    with open(path, 'w') as f:
+        f.write('{"data": [')
+        for index in range(size):
+            f.write((',' if index else '') + json.dumps(synthetic_insight('1', f"2020-01-{index % 28 + 1:02d}", rng)))
+        f.write(']}')
+    print(f"📄 Trang Graph: {os.path.getsize(path) / 1e6:.1f} MB")
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1', '--directory', os.path.dirname(path)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/act_1"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url, timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        rows = sum(1 for _ in _iter_pages(get_graph_transport('bench'), url, None, '1'))
+    finally:
+        server.terminate()
+        server.wait()
+    return rows, 0
+
+RUNNERS = {
+    'create': run_create,
+    'update': run_update,
+    'query': run_query,
+    'archive': run_archive,
+    'clear_script': run_clear_script,
+    'clear_scoped': run_clear_scoped,
+    'sync': run_sync,
+    'sync_batch': run_sync_batch,
+    'sync_fact': run_sync_fact,
+    'stream': run_stream,
+    'graph_page': run_graph_page,
+}
+
+# ========== WORKER (1 process / 1 phép đo) ==========
+
+def run_worker(op, size, args):
+    from benchmarks.mock_servers import MockApiServer, MockOptions
+
+    options = MockOptions(args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after)
+    mock = MockApiServer(options).start()
+    workdir = tempfile.mkdtemp(prefix='bench-')
+
+    # Module đọc cấu hình lúc import -> phải đặt env trước khi import module.*
+    os.environ.update({
+        'NOTION_API_BASE': mock.base_url + '/notion',
+        'FACEBOOK_GRAPH_BASE': mock.base_url + '/graph',
+        'NOTION_API_KEY': 'bench',
+        'FACEBOOK_ACCESS_TOKEN': 'bench',
+        'NOTION_DATABASE_ID_DAILY': mock.database_id,
+        'NOTION_RATE_LIMIT': str(args.notion_rate),
+        'NOTION_RATE_BURST': str(max(args.notion_rate, 1)),
+        'NOTION_WRITE_WORKERS': str(args.workers),
+        'SYNC_STATE_PATH': os.path.join(workdir, 'sync_state.db'),
+        'DEAD_LETTER_PATH': os.path.join(workdir, 'dead_letters.jsonl'),
+        'NOTION_SCHEMA_CACHE_DIR': os.path.join(workdir, 'schema'),
+        'HTTP_RETRY_BASE_DELAY': '0.05',
+        'INSIGHTS_CACHE_PATH': os.path.join(workdir, 'insights_cache.db'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    os.chdir(workdir)
+
+    from module.http_transport import add_response_hook
+
+    import random
+
+    # Reservoir sampling: tối đa LATENCY_SAMPLES mẫu để bộ nhớ không tăng theo số request
+    latencies = []
+    statuses = {}
+    sampler = random.Random(0)
+
+    def record(api, response):
+        total = sum(statuses.values())
+        latency = response.elapsed.total_seconds() * 1000
+        if len(latencies) < LATENCY_SAMPLES:
+            latencies.append(latency)
+        else:
+            slot = sampler.randrange(total + 1)
+            if slot < LATENCY_SAMPLES:
+                latencies[slot] = latency
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    add_response_hook(record)
+
+    start = time.perf_counter()
+    # Log từng dòng bỏ vào devnull (giữ trong StringIO thì bộ nhớ tăng theo số dòng)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows, failed = RUNNERS[op](mock, size, args)
+    elapsed = time.perf_counter() - start
+    mock.stop()
+
+    return {
+        'op': op,
+        'size': size,
+        'rows': rows,
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'pages_per_s': round(rows / elapsed, 1) if elapsed > 0 else 0,
+        'requests': sum(statuses.values()),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'status_429': statuses.get(429, 0),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+# ========== MAIN ==========
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Notion/Graph sync paths against in-process mock servers")
+    parser.add_argument('--ops', default=','.join(OPS), help=f"Các thao tác, mặc định {','.join(OPS)}")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Độ trễ mock mỗi request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Xác suất mock trả 429")
+    parser.add_argument('--retry-after', type=float, default=0.1, help="Retry-After (giây) kèm 429")
+    parser.add_argument('--notion-rate', type=float, default=0, help="NOTION_RATE_LIMIT (0 = không giới hạn)")
+    parser.add_argument('--workers', type=int, default=8, help="Số thread ghi Notion")
+    parser.add_argument('--window-days', type=int, default=7, help="FETCH_WINDOW_DAYS cho sync")
+    parser.add_argument('--json', help="Ghi kết quả ra file JSON")
+    parser.add_argument('--worker', nargs=2, metavar=('OP', 'SIZE'), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.worker:
+        op, size = args.worker
+        print(json.dumps(run_worker(op, int(size), args)))
+        return
+
+    ops = [op.strip() for op in args.ops.split(',') if op.strip()]
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    unknown = [op for op in ops if op not in RUNNERS]
+    if unknown:
+        print(f"❌ Thao tác không hợp lệ: {', '.join(unknown)}")
+        return
+
+    passthrough = [
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--rate-429', str(args.rate_429), '--retry-after', str(args.retry_after),
+        '--notion-rate', str(args.notion_rate), '--workers', str(args.workers),
+        '--window-days', str(args.window_days),
+    ]
+
+    print("\n" + "=" * 100)
+    print(f"⏱️  BENCHMARK - latency {args.latency_ms}±{args.jitter_ms}ms, 429 {args.rate_429:.1%}, "
+          f"Notion rate {args.notion_rate or '∞'}/s, {args.workers} workers")
+    print("=" * 100)
+    print(f"{'op':<13}{'rows':>9}{'seconds':>10}{'pages/s':>10}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}{'429':>6}{'failed':>8}{'RSS MB':>9}")
+    print("-" * 100)
+
+    results = []
+    for op in ops:
+        for size in sizes:
+            command = [sys.executable, os.path.abspath(__file__), '--worker', op, str(size)] + passthrough
+            completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+            if completed.returncode != 0:
+                print(f"{op:<13}{size:>9}  ❌ {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'lỗi'}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{op:<13}{result['rows']:>9}{result['seconds']:>10.2f}{result['pages_per_s']:>10.1f}"
+                  f"{result['requests']:>10}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                  f"{result['status_429']:>6}{result['failed']:>8}{result['peak_rss_mb']:>9.1f}")
+
+    print("=" * 100 + "\n")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Đã ghi {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
 # clear_notion_database_ultra_fast.py
-# 🗑️ XÓA TOÀN BỘ BẢN GHI - SIÊU NHANH (MAX PARALLEL - 20 THREADS)
-
-import requests
+# 🗑️ XÓA BẢN GHI - SIÊU NHANH (MAX PARALLEL - 20 THREADS)
+#
+# Query thẳng database (không quét /search cả workspace), có thể giới hạn theo account/khoảng ngày:
+#     python clear_notion_database.py                                   # xóa toàn bộ database daily
+#     python clear_notion_database.py --account 123 --since 2025-10-01 --until 2025-10-31
+#     python clear_notion_database.py --filter '{"property": "Date", "date": {"past_month": {}}}'
+#     python clear_notion_database.py --account 123 --dry-run           # chỉ đếm, không xóa
+
+import argparse
+import json
 import os
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+
+from module.log import ProgressLog, get_logger
+from module.metrics import get_metrics
+from module.notion_database_clearer import NotionDatabaseClearer, scope_filter
+from module.profiling import add_profile_argument, enable_profiling_from_args
 
 # ========== LOAD CONFIGURATION FILES ==========
 
@@ -16,185 +26,117 @@ load_dotenv(".env.config")
 
 NOTION_API_KEY = os.getenv('NOTION_API_KEY')
 NOTION_DATABASE_ID_DAILY = os.getenv('NOTION_DATABASE_ID_DAILY')
-
-# Lock để tránh race condition khi update counter
-delete_lock = Lock()
-deleted_count = 0
-failed_count = 0
-
-print("\n" + "=" * 70)
-print("🗑️  CLEAR NOTION DATABASE - SIÊU NHANH (MAX PARALLEL)")
-print("=" * 70)
-print(f"\n📊 Configuration:")
-print(f"   Database ID: {NOTION_DATABASE_ID_DAILY}")
-print(f"   Notion API Key: {NOTION_API_KEY[:20]}...")
-
-# ✅ Validation
-if not NOTION_DATABASE_ID_DAILY:
-    print("\n❌ LỖI: NOTION_DATABASE_ID_DAILY không có giá trị!")
-    exit(1)
-
-if not NOTION_API_KEY:
-    print("\n❌ LỖI: NOTION_API_KEY không có giá trị!")
-    exit(1)
-
-def get_notion_headers():
-    """Tạo headers cho Notion API"""
-    return {
-        'Authorization': f'Bearer {NOTION_API_KEY}',
-        'Content-Type': 'application/json',
-        'Notion-Version': '2025-09-03'
-    }
-
-def normalize_id(id_str):
-    """Normalize ID: xóa dấu - và convert thành lowercase"""
-    return id_str.replace('-', '').lower() if id_str else ""
-
-def get_all_pages():
-    """Lấy tất cả pages từ database bằng Search API"""
-    
-    print("\n📋 Bước 1: Lấy danh sách tất cả bản ghi...")
+ACCOUNT_PROPERTY = os.getenv('CLEAR_ACCOUNT_PROPERTY', 'Account ID')
+DATE_PROPERTY = os.getenv('CLEAR_DATE_PROPERTY', 'Date')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archive rows of the daily Notion database (optionally scoped)")
+    parser.add_argument('--account', action='append', default=[], help="Account ID cần xóa (lặp lại hoặc a,b,c)")
+    parser.add_argument('--since', help="Chỉ xóa dòng có Date >= YYYY-MM-DD")
+    parser.add_argument('--until', help="Chỉ xóa dòng có Date <= YYYY-MM-DD")
+    parser.add_argument('--filter', dest='raw_filter', help="Filter Notion dạng JSON (ghép AND với các điều kiện trên)")
+    parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm số dòng khớp, không xóa")
+    parser.add_argument('--workers', type=int, default=20)
+    add_profile_argument(parser)
+    return parser.parse_args()
+
+def build_filter(args):
+    """Ghép --account/--since/--until/--filter thành 1 filter query (None = cả database)"""
+    account_ids = [account.strip() for value in args.account for account in value.split(',') if account.strip()]
+    query_filter = scope_filter(
+        NOTION_DATABASE_ID_DAILY,
+        account_ids,
+        args.since,
+        args.until,
+        account_property=ACCOUNT_PROPERTY,
+        date_property=DATE_PROPERTY,
+        notion_api_key=NOTION_API_KEY,
+    )
+    if args.raw_filter:
+        raw_filter = json.loads(args.raw_filter)
+        query_filter = {"and": [query_filter, raw_filter]} if query_filter else raw_filter
+    return query_filter
+
+def delete_all_pages_parallel(query_filter=None, max_workers=20):
+    """Xóa các page khớp filter SIÊU NHANH: query và xóa chạy đồng thời (20 threads)
+
+    Trả về (số đã xóa, số thất bại).
+    """
+    
+    print("\n🗑️  Xóa bản ghi (SIÊU NHANH - query + xóa song song)...")
     print("-" * 70)
     
-    all_pages = []
-    has_more = True
-    next_cursor = None
-    target_db_id = normalize_id(NOTION_DATABASE_ID_DAILY)
-    
-    try:
-        url = "https://api.notion.com/v1/search"
-        
-        while has_more:
-            payload = {
-                "filter": {
-                    "value": "page",
-                    "property": "object"
-                },
-                "page_size": 100
-            }
-            
-            if next_cursor:
-                payload["start_cursor"] = next_cursor
-            
-            response = requests.post(
-                url,
-                json=payload,
-                headers=get_notion_headers(),
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get('results', [])
-                
-                for item in results:
-                    if item.get('object') == 'page':
-                        parent = item.get('parent', {})
-                        parent_db_id = parent.get('database_id', '')
-                        
-                        if parent_db_id and normalize_id(parent_db_id) == target_db_id:
-                            all_pages.append(item)
-                
-                has_more = data.get('has_more', False)
-                next_cursor = data.get('next_cursor')
-                
-                print(f"   ✅ Searched {len(results)} items (Found {len(all_pages)} in this DB)")
-            else:
-                print(f"   ❌ Lỗi search: {response.status_code}")
-                break
-        
-        print(f"\n✅ Tổng cộng lấy được: {len(all_pages)} bản ghi từ database")
-        return all_pages
-        
-    except Exception as e:
-        print(f"   ❌ Lỗi: {str(e)}")
-        return []
-
-def delete_page(page_id):
-    """Xóa 1 page từ Notion"""
+    progress_log = ProgressLog(get_logger("clear_notion_database"), "🗑️ Tiến độ xóa")
     
-    global deleted_count, failed_count
+    def progress(deleted, failed):
+        progress_log.set(deleted=deleted, failed=failed)
     
-    url = f"https://api.notion.com/v1/pages/{page_id}"
+    # Page lỗi sau khi hết retry đã được dead-letter -> replay_dead_letters.py chạy lại
+    result = NotionDatabaseClearer(NOTION_API_KEY).clear_database(
+        NOTION_DATABASE_ID_DAILY,
+        max_workers=max_workers,
+        on_progress=progress,
+        query_filter=query_filter,
+    )
+    progress_log.close()
+    deleted_count = result['deleted_pages']
+    failed_count = result['failed_pages']
     
-    try:
-        response = requests.patch(
-            url,
-            json={"archived": True},
-            headers=get_notion_headers(),
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            with delete_lock:
-                deleted_count += 1
-            return True
-        else:
-            with delete_lock:
-                failed_count += 1
-            return False
-            
-    except Exception as e:
-        with delete_lock:
-            failed_count += 1
-        return False
-
-def delete_all_pages_parallel(pages, max_workers=20):
-    """Xóa tất cả pages SIÊU NHANH bằng ThreadPoolExecutor (20 threads)"""
-    
-    global deleted_count, failed_count
-    
-    print("\n🗑️  Bước 2: Xóa tất cả bản ghi (SIÊU NHANH - 20 Parallel Threads)...")
-    print("-" * 70)
-    print(f"   Xóa {len(pages)} items ngay lập tức...\n")
-    
-    deleted_count = 0
-    failed_count = 0
-    total = len(pages)
-    
-    # ✅ FIX: Tăng max_workers lên 20 (xóa lập tức!)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit tất cả tasks
-        futures = {executor.submit(delete_page, page['id']): page for page in pages}
-        
-        # Process results khi hoàn thành
-        for i, future in enumerate(as_completed(futures), 1):
-            try:
-                result = future.result()
-                if result:
-                    progress = (deleted_count / total) * 100
-                    print(f"  ✅ Đã xóa: {deleted_count}/{total} ({progress:.1f}%)", end='\r')
-                    
-            except Exception as e:
-                print(f"  ⚠️ Lỗi: {str(e)[:40]}")
-    
-    print(f"\n\n✅ Hoàn thành: Đã xóa {deleted_count}/{total} bản ghi (Thất bại: {failed_count})")
-    return deleted_count
+    print(f"\n✅ Hoàn thành: Đã xóa {deleted_count}/{result['total_pages']} bản ghi (Thất bại: {failed_count})")
+    return deleted_count, failed_count
 
 def main():
     """Main function"""
     
-    pages = get_all_pages()
+    args = parse_args()
+    enable_profiling_from_args(args)
     
-    if not pages:
-        print("\n⚠️ Không có bản ghi nào để xóa!")
+    print("\n" + "=" * 70)
+    print("🗑️  CLEAR NOTION DATABASE - SIÊU NHANH (MAX PARALLEL)")
+    print("=" * 70)
+    print(f"\n📊 Configuration:")
+    print(f"   Database ID: {NOTION_DATABASE_ID_DAILY}")
+    print(f"   Notion API Key: {(NOTION_API_KEY or '')[:20]}...")
+    
+    # ✅ Validation
+    if not NOTION_DATABASE_ID_DAILY:
+        print("\n❌ LỖI: NOTION_DATABASE_ID_DAILY không có giá trị!")
+        exit(1)
+    
+    if not NOTION_API_KEY:
+        print("\n❌ LỖI: NOTION_API_KEY không có giá trị!")
+        exit(1)
+    
+    query_filter = build_filter(args)
+    print(f"   Filter: {json.dumps(query_filter, ensure_ascii=False) if query_filter else 'toàn bộ database'}")
+    
+    if args.dry_run:
+        NotionDatabaseClearer(NOTION_API_KEY).clear_database(
+            NOTION_DATABASE_ID_DAILY, dry_run=True, query_filter=query_filter
+        )
         return
     
     # ✅ FIX 1: Bỏ câu hỏi confirm - xóa lập tức!
     print("\n" + "=" * 70)
-    print(f"🚀 XÓA {len(pages)} BẢN GHI NGAY LẬP TỨC!")
+    print("🚀 XÓA BẢN GHI NGAY LẬP TỨC!")
     print("=" * 70)
     
-    # Xóa ngay mà không hỏi
-    deleted_count_result = delete_all_pages_parallel(pages, max_workers=20)
+    deleted_count, failed_count = delete_all_pages_parallel(query_filter, max_workers=args.workers)
+    
+    if not deleted_count and not failed_count:
+        print("\n⚠️ Không có bản ghi nào để xóa!")
+        return
     
     print("\n" + "=" * 70)
     print("✅ XÓA DATABASE HOÀN TẤT!")
     print("=" * 70)
-    print(f"📊 Tổng bản ghi: {len(pages)}")
-    print(f"✨ Đã xóa: {deleted_count_result}")
+    print(f"📊 Tổng bản ghi: {deleted_count + failed_count}")
+    print(f"✨ Đã xóa: {deleted_count}")
     print(f"❌ Thất bại: {failed_count}")
     print("=" * 70 + "\n")
+    
+    get_metrics().emit(extra={"deleted": deleted_count, "failed": failed_count})
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from module.sync_state import SyncStateStore
+
+Window = Tuple[str, str, str]  # (account_id, since, until)
+
+
+def split_range(since: str, until: str, window_days: int) -> List[Tuple[str, str]]:
+    """Chia [since, until] thành các cửa sổ tối đa window_days ngày"""
+    start = date.fromisoformat(since)
+    end = date.fromisoformat(until)
+    windows = []
+    while start <= end:
+        stop = min(end, start + timedelta(days=max(1, window_days) - 1))
+        windows.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+def plan_date_ranges(
+    account_ids: Sequence[str],
+    start_date: str,
+    end_date: str,
+    mode: str = "static",
+    state: Optional[SyncStateStore] = None,
+    scope: str = "",
+    lookback_days: int = 7,
+    today: Optional[date] = None,
+) -> Dict[str, Tuple[str, str]]:
+    """Khoảng ngày cần lấy cho từng account
+
+    static: [START_DATE, END_DATE] cho mọi account.
+    watermark: [watermark - lookback, hôm nay]; account chưa có watermark bắt đầu từ START_DATE.
+    """
+    if mode != "watermark":
+        return {account_id: (start_date, end_date) for account_id in account_ids}
+
+    today = today or date.today()
+    watermarks = state.get_watermarks(scope) if state is not None else {}
+    ranges = {}
+    for account_id in account_ids:
+        watermark = watermarks.get(account_id)
+        if watermark:
+            since = date.fromisoformat(watermark) - timedelta(days=lookback_days)
+            # Không lùi quá mốc bắt đầu báo cáo
+            since = max(since, date.fromisoformat(start_date))
+        else:
+            since = date.fromisoformat(start_date)
+        ranges[account_id] = (min(since, today).isoformat(), today.isoformat())
+    return ranges
+
+
+def plan_windows(ranges: Dict[str, Tuple[str, str]], window_days: int) -> Iterator[Window]:
+    """(account, since, until) cho từng cửa sổ, để fetch song song
+
+    Sinh dần (không dựng list): backfill nhiều năm × nhiều account có thể ra hàng trăm nghìn cửa sổ.
+    """
+    for account_id, (range_since, range_until) in ranges.items():
+        for since, until in split_range(range_since, range_until, window_days):
+            yield account_id, since, until
+
+
+def count_windows(ranges: Dict[str, Tuple[str, str]], window_days: int) -> int:
+    window_days = max(1, window_days)
+    return sum(
+        -(-((date.fromisoformat(until) - date.fromisoformat(since)).days + 1) // window_days)
+        for since, until in ranges.values()
+        if since <= until
+    )
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_DEAD_LETTER_PATH = os.getenv("DEAD_LETTER_PATH", ".sync_state/dead_letters.jsonl")
+
+
+class DeadLetterQueue:
+    """File JSONL lưu các lệnh ghi Notion thất bại hẳn (đã hết retry) để chạy lại sau"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_DEAD_LETTER_PATH
+        self._lock = threading.Lock()
+
+    def append(
+        self,
+        action: str,
+        method: str,
+        path: str,
+        payload: Dict,
+        label: str = "",
+        error: str = "",
+        meta: Optional[Dict] = None,
+    ):
+        entry = {
+            "failed_at": datetime.now().isoformat(timespec="seconds"),
+            "action": action,
+            "method": method,
+            "path": path,
+            "payload": payload,
+            "label": label,
+            "error": error,
+            "meta": meta or {},
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @property
+    def _replay_path(self) -> str:
+        return self.path + ".replay"
+
+    @property
+    def _done_path(self) -> str:
+        return self.path + ".replay.done"
+
+    def _done_indices(self) -> Set[int]:
+        if not os.path.exists(self._done_path):
+            return set()
+        with open(self._done_path, "r", encoding="utf-8") as f:
+            return {int(line) for line in f if line.strip().isdigit()}
+
+    @staticmethod
+    def _read(path: str, skip: Set[int] = frozenset()) -> Iterator[Tuple[int, Dict]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                line = line.strip()
+                if line and index not in skip:
+                    yield index, json.loads(line)
+
+    def claim(self) -> Iterator[Tuple[int, Dict]]:
+        """Lấy các entry ra để replay: (index, entry); entry vẫn lỗi sẽ được append lại vào file gốc
+
+        File được đổi tên sang .replay trước khi đọc. Mỗi entry xong (thành công, bỏ qua
+        hoặc đã ghi lại vào queue) phải gọi mark_done(index): index được ghi ngay vào
+        .replay.done, nên replay bị dừng giữa chừng thì lần sau chỉ gửi các entry chưa xong.
+        Gọi finish_claim() khi mọi entry đã xong.
+        """
+        with self._lock:
+            if os.path.exists(self.path) and not os.path.exists(self._replay_path):
+                os.replace(self.path, self._replay_path)
+        if not os.path.exists(self._replay_path):
+            return
+        yield from self._read(self._replay_path, self._done_indices())
+
+    def mark_done(self, index: int):
+        with self._lock:
+            with open(self._done_path, "a", encoding="utf-8") as f:
+                f.write(f"{index}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def finish_claim(self):
+        """Xóa file .replay và .replay.done sau khi mọi entry đã mark_done"""
+        with self._lock:
+            for path in (self._replay_path, self._done_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def peek(self) -> Iterator[Dict]:
+        """Đọc các entry đang chờ (cả phần chưa xong của file .replay dở dang) mà không lấy ra"""
+        if os.path.exists(self._replay_path):
+            for _, entry in self._read(self._replay_path, self._done_indices()):
+                yield entry
+        if os.path.exists(self.path):
+            for _, entry in self._read(self.path):
+                yield entry
+
+    def count(self) -> int:
+        return sum(1 for _ in self.peek())
+
+
+_default_queue: Optional[DeadLetterQueue] = None
+
+
+def get_dead_letter_queue() -> DeadLetterQueue:
+    global _default_queue
+    if _default_queue is None:
+        _default_queue = DeadLetterQueue()
+    return _default_queue
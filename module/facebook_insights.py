@@ -0,0 +1,457 @@
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from datetime import date, timedelta
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlencode, urlparse
+
+import requests
+from dotenv import load_dotenv
+from requests.structures import CaseInsensitiveDict
+
+from module.http_transport import get_graph_transport
+from module.insights_cache import InsightsCache, range_day
+from module.json_stream import iter_response_items
+from module.log import ProgressLog, get_logger
+from module.parallel import iter_merged
+from module.profiling import profile_stage
+from module.rate_governor import get_governor
+from module.retry import MAX_RETRIES
+
+load_dotenv()
+
+DEFAULT_FETCH_WORKERS = int(os.getenv("FACEBOOK_FETCH_WORKERS", "5"))
+# >1: gộp nhiều request insights vào 1 POST batch (Graph cho tối đa 50 sub-request); 0 = gửi lẻ
+DEFAULT_BATCH_SIZE = int(os.getenv("FACEBOOK_BATCH_SIZE", "0"))
+GRAPH_BATCH_LIMIT = 50
+# Số record giữ trong bộ nhớ trước khi ghi tạm xuống cache (theo request)
+STAGE_BATCH = 500
+
+_VERSION_RE = re.compile(r"^v\d+(\.\d+)?/")
+
+log = get_logger("facebook_insights")
+
+
+def _iter_pages(graph, url: str, query: Optional[Dict], account_id: str) -> Iterator[Dict]:
+    """Record từ url, đi theo paging.next cho tới trang cuối"""
+    while url:
+        with profile_stage("fetch"):
+            response = graph.get(url, params=query, stream=True)
+            if not response.ok:
+                # Body lỗi nhỏ: đọc hết để thông báo lỗi có nội dung và trả connection về pool
+                response.content
+            response.raise_for_status()
+
+        rest: Dict = {}
+        records = iter_response_items(response, "data", rest)
+        try:
+            while True:
+                with profile_stage("fetch"):
+                    record = next(records, None)
+                if record is None:
+                    break
+                record["account_id"] = account_id
+                yield record
+        finally:
+            records.close()
+
+        # paging.next đã chứa đủ query string (fields, cursor...)
+        url = rest.get("paging", {}).get("next")
+        query = None
+
+
+def iter_insights(account_id: str, params: Dict, access_token: Optional[str] = None) -> Iterator[Dict]:
+    """Lấy insights của 1 account, đi theo paging.next cho tới trang cuối
+
+    Body mỗi trang được giải mã dần (stream=True): record trả ra ngay khi đọc xong,
+    không giữ cả trang (có thể vài MB với level=ad) trong bộ nhớ.
+    """
+    graph = get_graph_transport(access_token)
+    yield from _iter_pages(graph, graph.url(f"act_{account_id}/insights"), dict(params), account_id)
+
+
+def window_params(params: Dict, since: str, until: str) -> Dict:
+    query = dict(params)
+    query["time_range[since]"] = since
+    query["time_range[until]"] = until
+    return query
+
+
+def _days(since: str, until: str) -> List[str]:
+    start = date.fromisoformat(since)
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((date.fromisoformat(until) - start).days + 1)]
+
+
+def _contiguous_runs(days: List[str]) -> List[Tuple[str, str]]:
+    """["2025-10-01", "2025-10-02", "2025-10-05"] -> [("2025-10-01", "2025-10-02"), ("2025-10-05", "2025-10-05")]"""
+    runs: List[List[str]] = []
+    for day in days:
+        if runs and date.fromisoformat(day) == date.fromisoformat(runs[-1][1]) + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(since, until) for since, until in runs]
+
+
+class InsightsRequest:
+    """1 request insights (account, [since, until]) đi theo paging
+
+    Có cache thì record được ghi tạm xuống đĩa theo lô STAGE_BATCH (không giữ cả khoảng
+    ngày trong bộ nhớ), finish() mới chuyển thành cache khi đã lấy hết các trang;
+    lỗi giữa chừng thì discard() (không lưu dữ liệu dở dang).
+    """
+
+    def __init__(self, account_id: str, since: str, until: str, params: Dict, cache: Optional[InsightsCache] = None):
+        self.account_id = account_id
+        self.since = since
+        self.until = until
+        self.query = window_params(params, since, until)
+        self.count = 0
+        # Số lần sub-request bị throttle trong batch
+        self.throttled = 0
+        self.cache = cache
+        self.daily = str(params.get("time_increment", "")) == "1"
+        self.days: Dict[str, None] = {}
+        self._staged: List[Tuple[str, str]] = []
+        if cache is not None:
+            self.key = cache.key(account_id, params)
+            self.token = uuid.uuid4().hex
+            days = _days(since, until) if self.daily else [range_day(since, until)]
+            self.days = dict.fromkeys(days)
+
+    @property
+    def relative_url(self) -> str:
+        return f"act_{self.account_id}/insights?{urlencode(self.query)}"
+
+    def add(self, record: Dict) -> Dict:
+        record["account_id"] = self.account_id
+        self.count += 1
+        if self.cache is not None:
+            day = record.get("date_start", self.since) if self.daily else range_day(self.since, self.until)
+            self.days.setdefault(day)
+            self._staged.append((day, json.dumps(record, ensure_ascii=False, separators=(",", ":"))))
+            if len(self._staged) >= STAGE_BATCH:
+                self._flush()
+        return record
+
+    def _flush(self):
+        if self._staged:
+            self.cache.stage(self.token, self._staged)
+            self._staged = []
+
+    def finish(self):
+        if self.cache is not None:
+            self._flush()
+            self.cache.commit(self.token, self.key, self.days)
+
+    def discard(self):
+        if self.cache is not None:
+            self._staged = []
+            self.cache.discard(self.token)
+
+
+def plan_window(
+    account_id: str, since: str, until: str, params: Dict, cache: Optional[InsightsCache] = None
+) -> Tuple[List[Dict], List[InsightsRequest]]:
+    """(record có sẵn trong cache, request cần gửi) cho 1 cửa sổ
+
+    Breakdown theo ngày (time_increment=1) được cache từng ngày, các ngày thiếu liền nhau
+    gộp thành 1 request; số liệu tổng cả khoảng được cache theo nguyên khoảng.
+    """
+    if cache is None:
+        return [], [InsightsRequest(account_id, since, until, params)]
+
+    daily = str(params.get("time_increment", "")) == "1"
+    days = _days(since, until) if daily else [range_day(since, until)]
+    cached = cache.get(cache.key(account_id, params), days)
+    records = [record for day in days for record in cached.get(day, ())]
+
+    missing = [day for day in days if day not in cached]
+    if not missing:
+        return records, []
+    runs = _contiguous_runs(missing) if daily else [(since, until)]
+    return records, [InsightsRequest(account_id, run_since, run_until, params, cache) for run_since, run_until in runs]
+
+
+def iter_insights_window(
+    account_id: str,
+    since: str,
+    until: str,
+    params: Dict,
+    access_token: Optional[str] = None,
+    cache: Optional[InsightsCache] = None,
+) -> Iterator[Dict]:
+    """Insights của 1 account trong [since, until]; có cache thì chỉ hỏi Graph phần chưa có/hết hạn"""
+    cached, requests_ = plan_window(account_id, since, until, params, cache)
+    yield from cached
+    for request in requests_:
+        try:
+            for record in iter_insights(account_id, request.query, access_token):
+                yield request.add(record)
+        except BaseException:
+            request.discard()
+            raise
+        request.finish()
+
+
+# ---------- Batch request ----------
+
+def _relative_url(graph, url: str) -> str:
+    """URL tuyệt đối (paging.next) -> relative_url của batch (bỏ host và phiên bản API)"""
+    if url.startswith(graph.base_url + "/"):
+        return url[len(graph.base_url) + 1:]
+    parsed = urlparse(url)
+    path = _VERSION_RE.sub("", parsed.path.lstrip("/"))
+    return f"{path}?{parsed.query}" if parsed.query else path
+
+
+class BatchResponse:
+    """1 sub-response của Graph batch, có status_code/headers/json() như requests.Response
+
+    Để RateGovernor đọc header usage (X-Ad-Account-Usage, X-Business-Use-Case-Usage...)
+    và mã lỗi throttle của từng account giống như với request lẻ.
+    """
+
+    def __init__(self, result: Dict):
+        self.status_code = int(result.get("code") or 0)
+        self.headers = CaseInsensitiveDict(
+            {header.get("name", ""): header.get("value", "") for header in result.get("headers") or []}
+        )
+        self.text = result.get("body") or ""
+        self.ok = self.status_code == 200
+
+    def json(self) -> Dict:
+        return json.loads(self.text or "{}")
+
+
+def _post_batch(graph, relative_urls: List[str]) -> List[Optional[BatchResponse]]:
+    """Gửi 1 batch GET; sub-response theo đúng thứ tự (None = Graph không trả kết quả / cả batch lỗi)"""
+    batch = [{"method": "GET", "relative_url": url} for url in relative_urls]
+    try:
+        with profile_stage("fetch"):
+            response = graph.post("", data={"batch": json.dumps(batch), "include_headers": "true"}, idempotent=True)
+            response.raise_for_status()
+            results = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.warning("⚠️ Batch Graph lỗi - gửi lại từng request", requests=len(relative_urls), error=str(e)[:200])
+        return [None] * len(relative_urls)
+
+    # Sub-request bị timeout phía Graph trả về null
+    responses = [BatchResponse(result) if result else None for result in results[:len(relative_urls)]]
+    return responses + [None] * (len(relative_urls) - len(responses))
+
+
+def _next_batch(governor, graph, pending: "deque", batch_size: int) -> List[Tuple[InsightsRequest, str]]:
+    """Lấy tối đa batch_size request từ pending, bỏ qua account đang bị governor tạm dừng
+
+    Request của account tạm dừng được để lại cuối hàng; nếu mọi account đều đang dừng
+    thì chờ tới khi account sớm nhất được gửi lại.
+    """
+    while True:
+        batch, deferred, wait = [], [], None
+        while pending and len(batch) < batch_size:
+            item = pending.popleft()
+            budget = governor.account_budget("graph", graph.url(item[1]))
+            paused = budget.paused_for() if budget is not None else 0.0
+            if paused > 0:
+                deferred.append(item)
+                wait = paused if wait is None else min(wait, paused)
+            else:
+                batch.append(item)
+        pending.extend(deferred)
+        if batch:
+            return batch
+        time.sleep(wait or 0)
+
+
+def iter_insights_batched(
+    windows: List[Tuple[str, str, str]],
+    params: Dict,
+    access_token: Optional[str] = None,
+    cache: Optional[InsightsCache] = None,
+    batch_size: int = GRAPH_BATCH_LIMIT,
+    failed: Optional[Set[str]] = None,
+    progress: Optional[ProgressLog] = None,
+) -> Iterator[Dict]:
+    """Insights của nhiều cửa sổ, gộp tối đa batch_size request (kể cả trang tiếp theo) vào 1 POST batch
+
+    Record được tách theo từng sub-request vào cùng 1 stream như khi gửi lẻ.
+    Header usage của từng sub-request đi vào ngân sách account của RateGovernor; sub-request
+    bị throttle được xếp lại và account đang tạm dừng không được đưa vào batch tiếp theo.
+    Sub-request lỗi khác (hoặc cả batch lỗi) được gửi lại riêng qua transport (có retry/backoff);
+    vẫn lỗi thì account vào `failed` và các request khác vẫn chạy tiếp.
+    """
+    graph = get_graph_transport(access_token)
+    governor = get_governor()
+    batch_size = max(1, min(batch_size, GRAPH_BATCH_LIMIT))
+    pending: "deque[Tuple[InsightsRequest, str]]" = deque()
+    for account_id, since, until in windows:
+        cached, requests_ = plan_window(account_id, since, until, params, cache)
+        yield from cached
+        pending.extend((request, request.relative_url) for request in requests_)
+
+    def done(request: InsightsRequest):
+        request.finish()
+        if progress:
+            progress.add("requests")
+            progress.add("records", request.count)
+        log.debug(
+            "📍 Request xong", account=request.account_id, since=request.since, until=request.until, records=request.count
+        )
+
+    while pending:
+        batch = _next_batch(governor, graph, pending, batch_size)
+        for _, url in batch:
+            # Tính vào ngân sách của account như request lẻ (token bucket, số request)
+            budget = governor.account_budget("graph", graph.url(url))
+            if budget is not None:
+                budget.wait()
+        responses = _post_batch(graph, [url for _, url in batch])
+        if progress:
+            progress.add("batches")
+        for (request, url), response in zip(batch, responses):
+            body = None
+            if response is not None:
+                # Header usage / lỗi throttle của từng sub-request -> ngân sách account của nó
+                governor.after_response("graph", graph.url(url), response)
+                if governor.is_throttled("graph", response) and request.throttled < MAX_RETRIES:
+                    # Account vừa bị tạm dừng: xếp lại, _next_batch chỉ gửi khi hết thời gian dừng
+                    request.throttled += 1
+                    if progress:
+                        progress.add("throttled")
+                    pending.append((request, url))
+                    continue
+                if response.ok:
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        body = None
+            if body is None:
+                # Gửi lại riêng từ đúng trang bị lỗi (các trang trước đã trả record)
+                try:
+                    for record in _iter_pages(graph, graph.url(url), None, request.account_id):
+                        yield request.add(record)
+                except Exception as e:
+                    request.discard()
+                    if progress:
+                        progress.add("errors")
+                    if failed is not None:
+                        failed.add(request.account_id)
+                    log.warning(
+                        "📍 Request lỗi", account=request.account_id, since=request.since, until=request.until,
+                        error=str(e)[:200],
+                    )
+                    continue
+                done(request)
+                continue
+
+            for record in body.get("data", []):
+                yield request.add(record)
+            next_url = body.get("paging", {}).get("next")
+            if next_url:
+                pending.append((request, _relative_url(graph, next_url)))
+            else:
+                done(request)
+
+
+def fetch_insights_windows(
+    windows: Iterable[Tuple[str, str, str]],
+    params: Dict,
+    access_token: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    buffer_size: int = 1000,
+    failed: Optional[Set[str]] = None,
+    cache: Optional[InsightsCache] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[Dict]:
+    """Lấy insights song song theo từng cửa sổ (account_id, since, until), trả record ngay khi về
+
+    Mỗi cửa sổ chạy trên 1 worker của pool giới hạn, record được đẩy qua queue có giới hạn.
+    Cửa sổ của cùng account chạy song song với nhau; account có cửa sổ lỗi được thêm vào `failed`.
+    cache: InsightsCache -> ngày đã có trong cache không hỏi lại Graph.
+    windows có thể là generator; chỉ cửa sổ đang chạy được giữ trong bộ nhớ.
+    batch_size > 1 (mặc định FACEBOOK_BATCH_SIZE): mỗi worker gửi batch tối đa batch_size request.
+    """
+    batch_size = DEFAULT_BATCH_SIZE if batch_size is None else batch_size
+    if batch_size > 1:
+        return _fetch_windows_batched(windows, params, access_token, max_workers, buffer_size, failed, cache, batch_size)
+
+    active: Dict[int, Tuple[str, str, str]] = {}
+
+    def producers() -> Iterator:
+        for index, (account_id, since, until) in enumerate(windows):
+            active[index] = (account_id, since, until)
+            yield partial(iter_insights_window, account_id, since, until, params, access_token, cache)
+
+    progress = ProgressLog(log, "📥 Tiến độ lấy Facebook")
+
+    def on_complete(index: int, count: int):
+        account_id, since, until = active.pop(index)
+        progress.add("windows")
+        progress.add("records", count)
+        log.debug("📍 Cửa sổ xong", account=account_id, since=since, until=until, records=count)
+
+    def on_error(index: int, error: Exception):
+        account_id, since, until = active.pop(index)
+        progress.add("errors")
+        if failed is not None:
+            failed.add(account_id)
+        log.warning("📍 Cửa sổ lỗi", account=account_id, since=since, until=until, error=str(error)[:200])
+
+    return iter_merged(
+        producers(),
+        max_workers or DEFAULT_FETCH_WORKERS,
+        buffer_size=buffer_size,
+        on_complete=on_complete,
+        on_error=on_error,
+    )
+
+
+def _fetch_windows_batched(
+    windows: Iterable[Tuple[str, str, str]],
+    params: Dict,
+    access_token: Optional[str],
+    max_workers: Optional[int],
+    buffer_size: int,
+    failed: Optional[Set[str]],
+    cache: Optional[InsightsCache],
+    batch_size: int,
+) -> Iterator[Dict]:
+    """Chia cửa sổ thành nhóm batch_size, mỗi nhóm là 1 producer iter_insights_batched"""
+    batch_size = min(batch_size, GRAPH_BATCH_LIMIT)
+    progress = ProgressLog(log, "📥 Tiến độ lấy Facebook (batch)")
+    active: Dict[int, List[Tuple[str, str, str]]] = {}
+
+    def producers() -> Iterator:
+        iterator = iter(windows)
+        index = 0
+        while True:
+            group = list(islice(iterator, batch_size))
+            if not group:
+                return
+            active[index] = group
+            index += 1
+            yield partial(iter_insights_batched, group, params, access_token, cache, batch_size, failed, progress)
+
+    def on_complete(index: int, count: int):
+        active.pop(index, None)
+
+    def on_error(index: int, error: Exception):
+        group = active.pop(index, [])
+        progress.add("errors")
+        if failed is not None:
+            failed.update(account_id for account_id, _, _ in group)
+        log.warning("📍 Nhóm batch lỗi", windows=len(group), error=str(error)[:200])
+
+    return iter_merged(
+        producers(),
+        max_workers or DEFAULT_FETCH_WORKERS,
+        buffer_size=buffer_size,
+        on_complete=on_complete,
+        on_error=on_error,
+    )
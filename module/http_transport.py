@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from module.rate_governor import RateGovernor, get_governor
+from module.retry import RetryPolicy
+
+load_dotenv()
+
+NOTION_BASE_URL = os.getenv("NOTION_API_BASE", "https://api.notion.com/v1")
+GRAPH_BASE_URL = os.getenv("FACEBOOK_GRAPH_BASE", "https://graph.facebook.com/v19.0")
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+
+# hook(api, response) được gọi sau mỗi response (kể cả lần retry) - dùng để đo đạc
+ResponseHook = Callable[[Optional[str], requests.Response], None]
+_response_hooks: List[ResponseHook] = []
+
+
+# retry_hook(api, method, url, lý do) được gọi trước mỗi lần gửi lại (lý do: mã HTTP hoặc tên exception)
+RetryHook = Callable[[Optional[str], str, str, str], None]
+_retry_hooks: List[RetryHook] = []
+
+
+def add_response_hook(hook: ResponseHook):
+    _response_hooks.append(hook)
+
+
+def remove_response_hook(hook: ResponseHook):
+    if hook in _response_hooks:
+        _response_hooks.remove(hook)
+
+
+def add_retry_hook(hook: RetryHook):
+    _retry_hooks.append(hook)
+
+
+def remove_retry_hook(hook: RetryHook):
+    if hook in _retry_hooks:
+        _retry_hooks.remove(hook)
+
+
+class HttpTransport:
+    """HTTP keep-alive dùng chung cho 1 host: connection pool + headers + timeout mặc định
+
+    Mỗi thread có Session riêng (cookie/header không bị tranh chấp) nhưng tất cả
+    cùng mount một HTTPAdapter, nên connection đã bắt tay TLS được dùng lại giữa các thread.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        timeout: float = 15,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        api: Optional[str] = None,
+        governor: Optional[RateGovernor] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        # api ("notion" / "graph") -> mọi request đi qua governor của API đó
+        self.api = api
+        self.governor = governor or get_governor()
+        self.retry = retry or RetryPolicy()
+        self.headers = dict(headers or {})
+        self.params = dict(params or {})
+        self.timeout = timeout
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """Gửi request qua governor, tự retry lỗi tạm thời (429, 5xx, mất kết nối)
+
+        idempotent=False (vd tạo page) chỉ gửi lại khi chắc chắn server chưa xử lý:
+        429/throttle hoặc lỗi lúc mở kết nối. 5xx và mất kết nối sau khi gửi thì trả
+        lỗi luôn (writer ghi dead-letter) để không tạo trùng page.
+        Mặc định: mọi method trừ POST là idempotent.
+        """
+        if idempotent is None:
+            idempotent = method.upper() != "POST"
+        url = self.url(path)
+        kwargs.setdefault("timeout", self.timeout)
+        if self.params:
+            # URL phân trang (paging.next) đã có sẵn access_token -> không thêm lần nữa
+            existing = parse_qs(urlparse(url).query)
+            params = {k: v for k, v in self.params.items() if k not in existing}
+            params.update(kwargs.get("params") or {})
+            kwargs["params"] = params
+
+        attempt = 0
+        while True:
+            if self.api:
+                self.governor.before_request(self.api, url)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if attempt < self.retry.max_retries and self.retry.should_retry_error(e, idempotent):
+                    for hook in _retry_hooks:
+                        hook(self.api, method, url, type(e).__name__)
+                    time.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raise
+
+            for hook in _response_hooks:
+                hook(self.api, response)
+
+            throttled = False
+            if self.api:
+                self.governor.after_response(self.api, url, response)
+                throttled = self.governor.is_throttled(self.api, response)
+            if attempt < self.retry.max_retries and self.retry.should_retry_response(response, throttled, idempotent):
+                for hook in _retry_hooks:
+                    hook(self.api, method, url, str(response.status_code))
+                # stream=True: trả connection về pool trước khi gửi lại
+                response.close()
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", path, **kwargs)
+
+    def close(self):
+        self._adapter.close()
+
+
+_transports: Dict[Tuple, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def _get_or_create(key: Tuple, factory) -> HttpTransport:
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = factory()
+            _transports[key] = transport
+        return transport
+
+
+def get_notion_transport(notion_api_key: Optional[str] = None, notion_version: str = "2025-09-03") -> HttpTransport:
+    """Transport Notion dùng chung theo (API key, Notion-Version)"""
+    api_key = notion_api_key or os.getenv("NOTION_API_KEY")
+    return _get_or_create(
+        ("notion", api_key, notion_version),
+        lambda: HttpTransport(
+            NOTION_BASE_URL,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "Notion-Version": notion_version
+            },
+            timeout=15,
+            api="notion",
+        ),
+    )
+
+
+def get_graph_transport(access_token: Optional[str] = None) -> HttpTransport:
+    """Transport Facebook Graph API dùng chung theo access token"""
+    token = access_token or os.getenv("FACEBOOK_ACCESS_TOKEN")
+    return _get_or_create(
+        ("graph", token),
+        lambda: HttpTransport(GRAPH_BASE_URL, params={"access_token": token}, timeout=30, api="graph"),
+    )
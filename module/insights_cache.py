@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.getenv("INSIGHTS_CACHE_PATH", ".sync_state/insights_cache.db")
+# Ngày gần đây (còn trong cửa sổ attribution) chỉ được dùng lại trong TTL giây
+DEFAULT_CACHE_TTL = float(os.getenv("INSIGHTS_CACHE_TTL", "3600"))
+# Ngày cũ hơn cửa sổ attribution coi như số liệu đã chốt -> cache vĩnh viễn
+DEFAULT_FINAL_AFTER_DAYS = int(os.getenv("ATTRIBUTION_LOOKBACK_DAYS", "7"))
+
+# Param không thuộc khóa cache (khoảng ngày nằm ở cột day, token không ảnh hưởng dữ liệu)
+_VOLATILE_PARAMS = {"time_range[since]", "time_range[until]", "access_token", "after", "limit"}
+
+
+def range_day(since: str, until: str) -> str:
+    """Khóa "ngày" của số liệu tổng cả khoảng (không time_increment)"""
+    return since if since == until else f"{since}..{until}"
+
+
+class InsightsCache:
+    """Cache response Graph Insights trên đĩa (SQLite): (account, params) × ngày -> records
+
+    params gồm level, fields, breakdowns, time_increment... nên đổi bất kỳ cái nào là khóa mới.
+    Ngày đã qua cửa sổ attribution được lưu vĩnh viễn; ngày gần đây hết hạn sau ttl giây.
+    Ngày không có số liệu cũng được lưu (records rỗng) để không hỏi lại Graph.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        final_after_days: Optional[int] = None,
+        today: Optional[date] = None,
+    ):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.ttl = DEFAULT_CACHE_TTL if ttl is None else ttl
+        self.final_after_days = DEFAULT_FINAL_AFTER_DAYS if final_after_days is None else final_after_days
+        self.today = today or date.today()
+        self.stats = {"hit_days": 0, "miss_days": 0}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Fetch chạy trên nhiều worker thread -> dùng chung 1 connection có khóa
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS insights (
+                    key TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    records_json TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    final INTEGER NOT NULL,
+                    PRIMARY KEY (key, day)
+                )
+                """
+            )
+            # Record của request đang chạy, ghi dần theo trang (TEMP: riêng connection này, mất khi đóng)
+            self._conn.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS staged (
+                    token TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    record_json TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS temp.staged_token ON staged (token, day)")
+            # Dọn ngày gần đây đã hết hạn
+            self._conn.execute(
+                "DELETE FROM insights WHERE final = 0 AND fetched_at < ?", (time.time() - self.ttl,)
+            )
+
+    @staticmethod
+    def key(account_id: str, params: Dict) -> str:
+        stable = {name: value for name, value in params.items() if name not in _VOLATILE_PARAMS}
+        if isinstance(stable.get("fields"), str):
+            stable["fields"] = ",".join(sorted(stable["fields"].split(",")))
+        encoded = json.dumps([account_id, stable], sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+    def is_final(self, until: str) -> bool:
+        """Số liệu tới ngày until đã chốt (qua cửa sổ attribution)"""
+        return date.fromisoformat(until) <= self.today - timedelta(days=self.final_after_days)
+
+    def get(self, key: str, days: Iterable[str]) -> Dict[str, List[Dict]]:
+        """{ngày: records} cho các ngày còn hiệu lực trong cache (ngày thiếu/hết hạn không có mặt)"""
+        days = list(days)
+        if not days:
+            return {}
+        expires_before = time.time() - self.ttl
+        placeholders = ",".join("?" * len(days))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT day, records_json, fetched_at, final FROM insights WHERE key = ? AND day IN ({placeholders})",
+                [key] + days,
+            )
+            rows = cursor.fetchall()
+        found = {
+            day: json.loads(records_json)
+            for day, records_json, fetched_at, final in rows
+            if final or fetched_at >= expires_before
+        }
+        with self._lock:
+            self.stats["hit_days"] += len(found)
+            self.stats["miss_days"] += len(days) - len(found)
+        return found
+
+    def stage(self, token: str, rows: Sequence[Tuple[str, str]]):
+        """Ghi tạm (ngày, record JSON) của 1 request đang chạy xuống đĩa, chưa thành cache"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO staged (token, day, record_json) VALUES (?, ?, ?)",
+                ((token, day, record_json) for day, record_json in rows),
+            )
+
+    def commit(self, token: str, key: str, days: Iterable[str]):
+        """Request đã lấy hết trang: gom record đã stage thành cache từng ngày (ngày rỗng lưu [])
+
+        Gom bằng SQL nên bộ nhớ không tăng theo số record; ngày tổng "since..until" chốt theo until.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            for day in days:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO insights (key, day, records_json, fetched_at, final)
+                    SELECT ?, ?, '[' || COALESCE(group_concat(record_json, ','), '') || ']', ?, ?
+                    FROM (SELECT record_json FROM staged WHERE token = ? AND day = ? ORDER BY rowid)
+                    """,
+                    (key, day, now, 1 if self.is_final(day.split("..")[-1]) else 0, token, day),
+                )
+            self._conn.execute("DELETE FROM staged WHERE token = ?", (token,))
+
+    def discard(self, token: str):
+        """Request lỗi giữa chừng: bỏ record đã stage (không lưu dữ liệu dở dang)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM staged WHERE token = ?", (token,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,104 @@
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Buffer text đọc dần từ các chunk; chỉ giữ phần chưa giải mã"""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                # Bỏ phần đã giải mã để buffer không lớn theo kích thước response
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Ký tự có nghĩa tiếp theo (bỏ khoảng trắng), "" khi hết dữ liệu"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON không hợp lệ: cần '{char}' tại vị trí {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Giải mã 1 giá trị JSON hoàn chỉnh, đọc thêm chunk nếu còn thiếu"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise
+            # Số ở cuối buffer có thể còn chữ số ở chunk sau
+            if end == len(self.buffer) and not self.eof and self._more():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array_items(chunks: Iterable[str], key: str, rest: Optional[Dict] = None) -> Iterator[Any]:
+    """Giải mã dần object JSON {..., key: [...], ...}: trả từng phần tử của mảng key
+
+    Các key khác (vd paging) được giải mã nguyên và ghi vào rest. Bộ nhớ chỉ
+    cần cho 1 phần tử + 1 chunk thay vì cả response.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() != "]":
+                while True:
+                    yield reader.value()
+                    if reader.peek() != ",":
+                        break
+                    reader.expect(",")
+            reader.expect("]")
+        else:
+            value = reader.value()
+            if rest is not None:
+                rest[name] = value
+        if reader.peek() != ",":
+            break
+        reader.expect(",")
+    reader.expect("}")
+
+
+def iter_response_items(response, key: str, rest: Optional[Dict] = None, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """iter_array_items trên body của requests.Response gửi với stream=True (đóng response khi xong)"""
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+
+    def chunks() -> Iterator[str]:
+        for chunk in response.iter_content(chunk_size):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    try:
+        yield from iter_array_items(chunks(), key, rest)
+    finally:
+        response.close()
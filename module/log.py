@@ -0,0 +1,206 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# DEBUG: in từng dòng/request như trước; INFO: chỉ tiến độ tổng hợp + cảnh báo
+DEFAULT_LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text (dễ đọc) | json (1 object / dòng, cho log collector)
+DEFAULT_LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+# Ghi thêm ra file (luôn dạng json)
+DEFAULT_LOG_FILE = os.getenv("LOG_FILE", "")
+# Giây giữa 2 dòng tiến độ
+DEFAULT_PROGRESS_INTERVAL = float(os.getenv("LOG_PROGRESS_INTERVAL", "10"))
+
+ROOT_LOGGER = "fb_notion_sync"
+_RESERVED_KWARGS = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+class TextFormatter(logging.Formatter):
+    """Message như print cũ, field có cấu trúc nối phía sau dạng key=value"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += "  " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            message += "\n" + record.exc_text
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Luôn ghi vào sys.stdout hiện tại (theo cả redirect_stdout), cùng chỗ với print"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class FieldLogger(logging.LoggerAdapter):
+    """log.info("✅ Tạo", label=..., seconds=...) - keyword lạ thành field có cấu trúc"""
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _RESERVED_KWARGS}
+        if fields:
+            kwargs["extra"] = dict(kwargs.get("extra") or {}, fields=fields)
+        return msg, kwargs
+
+
+class _FlushMarker:
+    """Đặt vào queue log; listener gặp thì báo lại -> mọi record put trước nó đã được ghi"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Listener(logging.handlers.QueueListener):
+    def handle(self, record):
+        if isinstance(record, _FlushMarker):
+            record.done.set()
+            return
+        super().handle(record)
+
+
+_listener: Optional[_Listener] = None
+_stopped = False
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None, log_file: Optional[str] = None):
+    """Logger fb_notion_sync.* đi qua queue: thread gọi log chỉ put vào queue,
+    1 thread listener lo format và ghi ra stdout/file (gọi lại nhiều lần vô hại)
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        console = _StdoutHandler()
+        console.setFormatter(JsonFormatter() if (fmt or DEFAULT_LOG_FORMAT) == "json" else TextFormatter())
+        handlers = [console]
+        log_file = DEFAULT_LOG_FILE if log_file is None else log_file
+        if log_file:
+            directory = os.path.dirname(log_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = logging.FileHandler(log_file, encoding="utf-8")
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        records: "queue.SimpleQueue" = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel((level or DEFAULT_LOG_LEVEL).upper())
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.propagate = False
+
+        _listener = _Listener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    """Lúc thoát: ghi nốt queue rồi dừng listener (chỉ 1 lần)"""
+    global _stopped
+    with _setup_lock:
+        if _listener is None or _stopped:
+            return
+        _stopped = True
+    _listener.stop()
+
+
+def flush_logs():
+    """Chờ listener ghi hết log đang xếp hàng (gọi trước khi print summary để không bị xen thứ tự)
+
+    Đặt 1 marker vào cuối queue và đợi listener xử lý tới nó; thread khác vẫn log
+    bình thường trong lúc chờ (record của họ đứng sau marker, không bị mất hay đảo thứ tự).
+    """
+    if _listener is None or _stopped:
+        return
+    marker = _FlushMarker()
+    _listener.queue.put(marker)
+    marker.done.wait()
+
+
+def get_logger(name: str) -> FieldLogger:
+    setup_logging()
+    return FieldLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
+
+
+class ProgressLog:
+    """Đếm sự kiện từ nhiều thread, mỗi interval giây log 1 dòng tổng hợp
+
+    Số dòng log không tăng theo số row: 1M page vẫn chỉ vài dòng tiến độ ở mức INFO.
+    """
+
+    def __init__(self, logger: FieldLogger, message: str, interval: Optional[float] = None):
+        self.logger = logger
+        self.message = message
+        self.interval = DEFAULT_PROGRESS_INTERVAL if interval is None else interval
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._next = self._start + self.interval
+
+    def add(self, key: str, count: int = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + count
+        self._maybe_log()
+
+    def set(self, **counts: int):
+        """Cập nhật số đếm tuyệt đối (callback kiểu on_progress(deleted, failed))"""
+        with self._lock:
+            self.counts.update(counts)
+        self._maybe_log()
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        if now < self._next:
+            return
+        with self._lock:
+            if now < self._next:
+                return
+            self._next = now + self.interval
+            fields = self._fields(now)
+        self.logger.info(self.message, **fields)
+
+    def _fields(self, now: float) -> Dict:
+        elapsed = now - self._start
+        total = sum(self.counts.values())
+        return dict(self.counts, rate=f"{total / elapsed:.1f}/s" if elapsed > 0 else "-")
+
+    def close(self):
+        """Dòng cuối (DEBUG - summary của script đã in tổng), rồi đợi log ghi xong"""
+        with self._lock:
+            fields = self._fields(time.monotonic())
+        self.logger.debug(self.message, **fields)
+        flush_logs()
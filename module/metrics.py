@@ -0,0 +1,335 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from module.http_transport import add_response_hook, add_retry_hook
+from module.profiling import profile_stage
+from module.rate_governor import get_governor
+
+load_dotenv()
+
+DEFAULT_METRICS_DIR = os.getenv("METRICS_DIR", ".sync_state/metrics")
+METRIC_PREFIX = "fb_notion_sync"
+# Giới hạn trên (giây) các bucket histogram latency
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}")
+_ACCOUNT_RE = re.compile(r"act_\d+")
+_NUMBER_RE = re.compile(r"/\d+(?=/|$)")
+
+# Tên thao tác ghi của NotionWriter -> tên stage
+WRITE_STAGES = {"created": "create", "updated": "update", "archived": "archive"}
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """"PATCH https://api.notion.com/v1/pages/<uuid>" -> "PATCH /v1/pages/{id}" (gom nhãn theo endpoint)"""
+    path = _UUID_RE.sub("{id}", urlparse(url).path)
+    path = _ACCOUNT_RE.sub("act_{id}", path)
+    return f"{method} {_NUMBER_RE.sub('/{id}', path)}"
+
+
+def default_run_name() -> str:
+    """Tên script đang chạy (sync_facebook_notion_daily, run_sync_jobs...)"""
+    return os.path.splitext(os.path.basename(sys.argv[0] or ""))[0] or "sync"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        """[(le, số quan sát ≤ le)] kiểu Prometheus, kết thúc bằng +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((str(bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Ước lượng theo bucket (giới hạn trên của bucket chứa percentile)"""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        for bound, count in self.cumulative():
+            if count >= target:
+                return float(bound) if bound != "+Inf" else None
+        return None
+
+
+class RunMetrics:
+    """Timer + counter cho từng stage (fetch, transform, query, create, update, archive) và từng endpoint
+
+    Request được đếm qua response/retry hook của HttpTransport, nên mọi module đi qua
+    transport đều được đo mà không phải sửa từng chỗ gọi. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self.stages: Dict[str, Dict] = {}
+            self.endpoints: Dict[tuple, Dict] = {}
+            self.retries: Dict[tuple, int] = {}
+
+    # ---------- Stage ----------
+
+    def _stage(self, name: str) -> Dict:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"seconds": 0.0, "calls": 0, "items": 0, "failed": 0, "latency": Histogram()}
+        return stage
+
+    def add_stage(self, name: str, seconds: float = 0.0, items: int = 0, calls: int = 1, failed: int = 0):
+        with self._lock:
+            stage = self._stage(name)
+            stage["seconds"] += seconds
+            stage["calls"] += calls
+            stage["items"] += items
+            stage["failed"] += failed
+
+    @contextmanager
+    def stage(self, name: str):
+        """Đo thời gian 1 khối code: with metrics.stage("query"): ..."""
+        start = time.perf_counter()
+        try:
+            with profile_stage(name):
+                yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def timed_iter(self, name: str, iterable: Iterable, exclude: Optional[str] = None) -> Iterator:
+        """Đếm item và cộng thời gian chờ next() vào stage name
+
+        exclude: stage của iterator bên trong (vd transform bọc fetch) -> trừ phần
+        thời gian đó để mỗi stage chỉ tính phần của riêng nó.
+        """
+        iterator = iter(iterable)
+        while True:
+            inner_before = self._seconds(exclude) if exclude else 0.0
+            start = time.perf_counter()
+            try:
+                with profile_stage(name):
+                    item = next(iterator)
+            except StopIteration:
+                self.add_stage(name, self._exclusive(start, exclude, inner_before))
+                return
+            self.add_stage(name, self._exclusive(start, exclude, inner_before), items=1, calls=0)
+            yield item
+
+    def _seconds(self, name: str) -> float:
+        with self._lock:
+            stage = self.stages.get(name)
+            return stage["seconds"] if stage else 0.0
+
+    def _exclusive(self, start: float, exclude: Optional[str], inner_before: float) -> float:
+        elapsed = time.perf_counter() - start
+        if exclude:
+            elapsed -= self._seconds(exclude) - inner_before
+        return max(0.0, elapsed)
+
+    def observe_write(self, action: str, seconds: float, ok: bool):
+        """1 lệnh ghi Notion (create/update/archive) xong sau seconds giây"""
+        with self._lock:
+            stage = self._stage(WRITE_STAGES.get(action, action))
+            stage["seconds"] += seconds
+            stage["items"] += 1
+            stage["failed"] += 0 if ok else 1
+            stage["latency"].observe(seconds)
+
+    # ---------- Hook của HttpTransport ----------
+
+    def on_response(self, api: Optional[str], response):
+        request = response.request
+        key = (api or "other", endpoint_name(request.method, request.url))
+        body = request.body or b""
+        sent = len(body.encode("utf-8") if isinstance(body, str) else body)
+        received = response_size(response)
+        throttled = bool(api) and get_governor().is_throttled(api, response)
+        with self._lock:
+            endpoint = self.endpoints.get(key)
+            if endpoint is None:
+                endpoint = self.endpoints[key] = {
+                    "statuses": {}, "throttled": 0, "bytes_sent": 0, "bytes_received": 0, "latency": Histogram()
+                }
+            status = str(response.status_code)
+            endpoint["statuses"][status] = endpoint["statuses"].get(status, 0) + 1
+            endpoint["throttled"] += 1 if throttled else 0
+            endpoint["bytes_sent"] += sent
+            endpoint["bytes_received"] += received
+            endpoint["latency"].observe(response.elapsed.total_seconds())
+
+    def on_retry(self, api: Optional[str], method: str, url: str, reason: str):
+        key = (api or "other", reason)
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    # ---------- Báo cáo ----------
+
+    def report(self, run: Optional[str] = None, extra: Optional[Dict] = None) -> Dict:
+        """Toàn bộ số đo dạng dict (JSON được)"""
+        with self._lock:
+            duration = time.perf_counter() - self._started
+            stages = {
+                name: {
+                    "seconds": round(stage["seconds"], 4),
+                    "calls": stage["calls"],
+                    "items": stage["items"],
+                    "failed": stage["failed"],
+                    "items_per_s": round(stage["items"] / stage["seconds"], 2) if stage["seconds"] > 0 else None,
+                    "p50_s": stage["latency"].percentile(50),
+                    "p99_s": stage["latency"].percentile(99),
+                }
+                for name, stage in self.stages.items()
+            }
+            endpoints = [
+                {
+                    "api": api,
+                    "endpoint": name,
+                    "requests": endpoint["latency"].count,
+                    "statuses": dict(endpoint["statuses"]),
+                    "throttled": endpoint["throttled"],
+                    "bytes_sent": endpoint["bytes_sent"],
+                    "bytes_received": endpoint["bytes_received"],
+                    "latency_sum_s": round(endpoint["latency"].sum, 4),
+                    "latency_buckets": dict(endpoint["latency"].cumulative()),
+                    "p50_s": endpoint["latency"].percentile(50),
+                    "p99_s": endpoint["latency"].percentile(99),
+                }
+                for (api, name), endpoint in sorted(self.endpoints.items())
+            ]
+            retries = [{"api": api, "reason": reason, "count": count} for (api, reason), count in sorted(self.retries.items())]
+
+        return {
+            "run": run or default_run_name(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "duration_s": round(duration, 3),
+            "stages": stages,
+            "endpoints": endpoints,
+            "retries": retries,
+            "result": extra or {},
+        }
+
+    def to_prometheus(self, report: Dict) -> str:
+        """Báo cáo -> định dạng text của Prometheus (node_exporter textfile collector)"""
+        run = report["run"]
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(value_)}"' for key, value_ in dict(run=run, **labels).items())
+                lines.append(f"{full}{suffix}{{{label_text}}} {value}")
+
+        metric("run_duration_seconds", "gauge", "Wall time of the run",
+               [("", {}, report["duration_s"])])
+        metric("run_timestamp_seconds", "gauge", "Unix time the run started",
+               [("", {}, round(self.started_at, 3))])
+        metric("stage_seconds", "gauge", "Time spent per stage (summed over threads)",
+               [("", {"stage": name}, stage["seconds"]) for name, stage in report["stages"].items()])
+        metric("stage_items", "gauge", "Items processed per stage",
+               [("", {"stage": name}, stage["items"]) for name, stage in report["stages"].items()])
+        metric("stage_failed", "gauge", "Failed items per stage",
+               [("", {"stage": name}, stage["failed"]) for name, stage in report["stages"].items()])
+        metric("requests", "gauge", "HTTP responses per endpoint and status",
+               [("", {"api": e["api"], "endpoint": e["endpoint"], "status": status}, count)
+                for e in report["endpoints"] for status, count in e["statuses"].items()])
+        metric("throttled", "gauge", "Rate-limited responses per endpoint",
+               [("", {"api": e["api"], "endpoint": e["endpoint"]}, e["throttled"]) for e in report["endpoints"]])
+        metric("bytes", "gauge", "Bytes transferred per endpoint",
+               [("", {"api": e["api"], "endpoint": e["endpoint"], "direction": direction}, e[f"bytes_{direction}"])
+                for e in report["endpoints"] for direction in ("sent", "received")])
+        metric("retries", "gauge", "Retried requests per reason",
+               [("", {"api": r["api"], "reason": r["reason"]}, r["count"]) for r in report["retries"]])
+
+        samples = []
+        for e in report["endpoints"]:
+            labels = {"api": e["api"], "endpoint": e["endpoint"]}
+            samples.extend(("_bucket", dict(labels, le=le), count) for le, count in e["latency_buckets"].items())
+            samples.append(("_sum", labels, e["latency_sum_s"]))
+            samples.append(("_count", labels, e["requests"]))
+        metric("request_duration_seconds", "histogram", "HTTP latency per endpoint", samples)
+
+        results = [("", {"result": key}, value) for key, value in report["result"].items()
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if results:
+            metric("rows", "gauge", "Rows per sync result", results)
+        return "\n".join(lines) + "\n"
+
+    def emit(self, run: Optional[str] = None, extra: Optional[Dict] = None, directory: Optional[str] = None) -> Dict:
+        """Ghi {run}.json, {run}.prom và nối 1 dòng vào history.jsonl trong METRICS_DIR"""
+        report = self.report(run, extra)
+        directory = directory or DEFAULT_METRICS_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, report["run"])
+            _write_atomic(base + ".json", json.dumps(report, ensure_ascii=False, indent=2))
+            _write_atomic(base + ".prom", self.to_prometheus(report))
+            with open(os.path.join(directory, "history.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False, separators=(",", ":")) + "\n")
+            print(f"📈 Metrics: {base}.json, {base}.prom")
+        except OSError as e:
+            print(f"⚠️ Không ghi được metrics: {str(e)[:80]}")
+        return report
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _write_atomic(path: str, text: str):
+    # node_exporter có thể đọc file bất cứ lúc nào -> ghi file tạm rồi rename
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def response_size(response) -> int:
+    """Số byte body theo Content-Length; chỉ đo body khi đã đọc sẵn
+
+    Không được chạm response.content: với stream=True (trang Insights) nó đọc cả body
+    vào bộ nhớ trước khi json_stream kịp giải mã dần.
+    """
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    if getattr(response, "_content_consumed", False) and isinstance(getattr(response, "_content", None), bytes):
+        return len(response._content)
+    return 0
+
+
+_metrics = RunMetrics()
+add_response_hook(_metrics.on_response)
+add_retry_hook(_metrics.on_retry)
+
+
+def get_metrics() -> RunMetrics:
+    """Bộ đo dùng chung cho toàn bộ process"""
+    return _metrics
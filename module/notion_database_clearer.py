@@ -1,34 +1,43 @@
 import os
+import queue
+import threading
+import time
 import requests
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from dotenv import load_dotenv
 
+from module.dead_letter import get_dead_letter_queue
+from module.http_transport import get_notion_transport
+from module.log import ProgressLog, get_logger
+from module.metrics import get_metrics
+from module.profiling import profile_stage
+from module.notion_schema import get_database_schema
+
 load_dotenv()
 
+_STOP = object()
+
+log = get_logger("notion_database_clearer")
+
 class NotionDatabaseClearer:
     """Cái hộp xóa dữ liệu Notion"""
     
     def __init__(self, notion_api_key: Optional[str] = None):
         self.notion_api_key = notion_api_key or os.getenv("NOTION_API_KEY")
-        self.headers = {
-            "Authorization": f"Bearer {self.notion_api_key}",
-            "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28"
-        }
-        self.base_url = "https://api.notion.com/v1"
+        self.transport = get_notion_transport(self.notion_api_key, "2022-06-28")
     
     def get_all_pages(self, database_id: str, batch_size: int = 100) -> List[Dict]:
+        """Gom toàn bộ page vào list (chỉ dùng khi cần cả danh sách; xóa thì dùng clear_database)"""
         all_pages = []
         has_more = True
         start_cursor = None
         
         while has_more:
-            query_url = f"{self.base_url}/databases/{database_id}/query"
             payload = {"page_size": batch_size}
             if start_cursor:
                 payload["start_cursor"] = start_cursor
             
-            response = requests.post(query_url, headers=self.headers, json=payload)
+            response = self.transport.post(f"databases/{database_id}/query", json=payload, idempotent=True)
             response.raise_for_status()
             
             data = response.json()
@@ -36,48 +45,208 @@ class NotionDatabaseClearer:
             has_more = data.get("has_more", False)
             start_cursor = data.get("next_cursor")
             
-            print(f"✓ Lấy {len(data.get('results', []))} trang")
+            log.debug("✓ Lấy trang query", pages=len(data.get("results", [])))
         
         return all_pages
     
     def delete_page(self, page_id: str) -> bool:
+        start = time.perf_counter()
         try:
-            update_url = f"{self.base_url}/pages/{page_id}"
-            response = requests.patch(update_url, headers=self.headers, json={"archived": True})
-            response.raise_for_status()
+            with profile_stage("archive"):
+                response = self.transport.patch(f"pages/{page_id}", json={"archived": True})
+                response.raise_for_status()
+            get_metrics().observe_write("archived", time.perf_counter() - start, True)
             return True
         except requests.exceptions.RequestException as e:
-            print(f"✗ Lỗi: {e}")
+            log.warning("✗ Lỗi xóa page", page_id=page_id, error=str(e)[:300])
+            get_metrics().observe_write("archived", time.perf_counter() - start, False)
+            # Lỗi sau khi hết retry -> dead-letter để replay_dead_letters.py chạy lại
+            get_dead_letter_queue().append(
+                "archived", "PATCH", f"pages/{page_id}", {"archived": True}, label=page_id, error=str(e)
+            )
             return False
     
-    def clear_database(self, database_id: str, dry_run: bool = False) -> Dict:
-        print(f"Database: {database_id}")
-        pages = self.get_all_pages(database_id)
-        total_pages = len(pages)
+    def iter_page_ids(
+        self,
+        database_id: str,
+        query_filter: Optional[Dict] = None,
+        batch_size: int = 100,
+        verbose: bool = True,
+    ) -> Iterator[str]:
+        """Page id của database (chỉ dòng khớp query_filter), trả ngay theo từng trang query"""
+        start_cursor = None
+        while True:
+            payload = {"page_size": batch_size}
+            if query_filter:
+                payload["filter"] = query_filter
+            if start_cursor:
+                payload["start_cursor"] = start_cursor
+            
+            response = self.transport.post(f"databases/{database_id}/query", json=payload, idempotent=True)
+            response.raise_for_status()
+            data = response.json()
+            results = data.get("results", [])
+            if verbose:
+                log.debug("✓ Lấy trang query", pages=len(results))
+            for page in results:
+                yield page["id"]
+            
+            if not data.get("has_more"):
+                break
+            start_cursor = data.get("next_cursor")
+    
+    def archive_pages(
+        self,
+        page_ids: Iterable[str],
+        max_workers: int = 8,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict:
+        """Archive song song: page_ids được đẩy vào queue có giới hạn, max_workers thread lấy ra xóa
+        
+        Thread gọi hàm là producer (đọc page_ids, thường là query đang phân trang),
+        nên lệnh xóa đầu tiên chạy ngay khi trang query đầu tiên về và bộ nhớ không phụ thuộc số page.
+        on_progress(deleted, failed) được gọi sau mỗi lệnh xóa.
+        """
+        pending: "queue.Queue" = queue.Queue(maxsize=max_workers * 4)
+        lock = threading.Lock()
+        counts = {"deleted": 0, "failed": 0, "failed_ids": []}
         
-        if total_pages == 0:
-            return {"total_pages": 0, "deleted_pages": 0, "failed_pages": 0}
+        def worker():
+            while True:
+                page_id = pending.get()
+                if page_id is _STOP:
+                    return
+                try:
+                    ok = self.delete_page(page_id)
+                except Exception:
+                    ok = False
+                with lock:
+                    counts["deleted" if ok else "failed"] += 1
+                    if not ok:
+                        counts["failed_ids"].append(page_id)
+                    deleted, failed = counts["deleted"], counts["failed"]
+                if on_progress:
+                    on_progress(deleted, failed)
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for page_id in page_ids:
+                pending.put(page_id)
+        finally:
+            for _ in threads:
+                pending.put(_STOP)
+            for thread in threads:
+                thread.join()
+        return counts
+    
+    def clear_database(
+        self,
+        database_id: str,
+        dry_run: bool = False,
+        max_workers: int = 8,
+        max_passes: int = 3,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        query_filter: Optional[Dict] = None,
+    ) -> Dict:
+        """Archive mọi page (hoặc chỉ page khớp query_filter): query và xóa chạy đồng thời (streaming)
+        
+        Xóa trong lúc đang phân trang có thể làm cursor bỏ sót vài page,
+        nên query lại (tối đa max_passes lượt) tới khi không còn page nào chưa xử lý.
+        """
+        print(f"Database: {database_id}")
         
         if dry_run:
+            total_pages = sum(1 for _ in self.iter_page_ids(database_id, query_filter))
             print(f"🔍 Dry run: {total_pages} trang sẽ xóa")
             return {"total_pages": total_pages, "deleted_pages": 0, "failed_pages": 0}
         
         deleted_count = 0
-        failed_count = 0
-        
-        for index, page in enumerate(pages, 1):
-            if self.delete_page(page["id"]):
-                deleted_count += 1
-            else:
-                failed_count += 1
+        failed_ids = set()
+        for _ in range(max_passes):
+            page_ids = (
+                page_id
+                for page_id in get_metrics().timed_iter("query", self.iter_page_ids(database_id, query_filter))
+                if page_id not in failed_ids
+            )
+            offset = deleted_count
+            
+            def progress(deleted, failed):
+                if on_progress:
+                    on_progress(offset + deleted, len(failed_ids) + failed)
+            
+            result = self.archive_pages(page_ids, max_workers, progress)
+            deleted_count += result["deleted"]
+            failed_ids.update(result["failed_ids"])
+            if result["deleted"] + result["failed"] == 0:
+                break
         
         return {
-            "total_pages": total_pages,
+            "total_pages": deleted_count + len(failed_ids),
             "deleted_pages": deleted_count,
-            "failed_pages": failed_count
+            "failed_pages": len(failed_ids)
         }
+    
+    def clear_database_parallel(self, database_id: str, max_workers: int = 8) -> Dict:
+        """Như clear_database, log tiến độ định kỳ (LOG_PROGRESS_INTERVAL)"""
+        print(f"   ⚡ Xóa streaming với {max_workers} threads (xóa ngay khi query về)...")
+        start_time = time.time()
+        progress = ProgressLog(log, "🗑️ Tiến độ xóa")
+        
+        result = self.clear_database(
+            database_id,
+            max_workers=max_workers,
+            on_progress=lambda deleted, failed: progress.set(deleted=deleted, failed=failed),
+        )
+        progress.close()
+        elapsed_time = time.time() - start_time
+        
+        if result["total_pages"] == 0:
+            print(f"   ✅ Database đã trống!")
+            return result
+        
+        print(f"\n   ✅ Xóa thành công: {result['deleted_pages']}/{result['total_pages']} pages")
+        print(f"   ⏱️  Thời gian: {elapsed_time:.1f}s")
+        if result["failed_pages"] > 0:
+            print(f"   ⚠️  Lỗi: {result['failed_pages']} pages")
+        return result
+
+
+def scope_filter(
+    database_id: str,
+    account_ids: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    account_property: str = "Account ID",
+    date_property: str = "Date",
+    notion_api_key: Optional[str] = None,
+) -> Optional[Dict]:
+    """Filter query Notion theo account và/hoặc khoảng ngày (None nếu không giới hạn gì)
+
+    Kiểu của cột account (title/rich_text) lấy từ schema database để filter đúng cú pháp.
+    """
+    conditions = []
+    if account_ids:
+        schema = get_database_schema(database_id, notion_api_key)
+        kind = schema.get(account_property, {}).get("type") or "rich_text"
+        accounts = [{"property": account_property, kind: {"equals": account_id}} for account_id in account_ids]
+        conditions.append(accounts[0] if len(accounts) == 1 else {"or": accounts})
+    if since:
+        conditions.append({"property": date_property, "date": {"on_or_after": since}})
+    if until:
+        conditions.append({"property": date_property, "date": {"on_or_before": until}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"and": conditions}
 
 
-def clear_notion_database(database_id: str, notion_api_key: Optional[str] = None, dry_run: bool = False) -> Dict:
+def clear_notion_database(
+    database_id: str,
+    notion_api_key: Optional[str] = None,
+    dry_run: bool = False,
+    query_filter: Optional[Dict] = None,
+) -> Dict:
     clearer = NotionDatabaseClearer(notion_api_key)
-    return clearer.clear_database(database_id, dry_run=dry_run)
+    return clearer.clear_database(database_id, dry_run=dry_run, query_filter=query_filter)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+_TEXT_TYPES = ("title", "rich_text")
+
+
+def property_value(prop: Dict) -> Any:
+    """Lấy giá trị đơn giản từ 1 Notion property
+
+    Dùng được cho cả property trả về từ query lẫn property trong payload ghi,
+    để so sánh giá trị hiện có với giá trị sắp ghi.
+    """
+    if not prop:
+        return None
+
+    prop_type = prop.get("type")
+    if prop_type is None:
+        prop_type = next((key for key in prop if key != "id"), None)
+    value = prop.get(prop_type)
+
+    if prop_type in _TEXT_TYPES:
+        parts = []
+        for item in value or []:
+            text = item.get("plain_text")
+            if text is None:
+                text = item.get("text", {}).get("content", "")
+            parts.append(text)
+        return "".join(parts)
+
+    if prop_type == "number":
+        return float(value) if value is not None else None
+
+    if prop_type == "date":
+        return (value or {}).get("start")
+
+    if prop_type in ("select", "status"):
+        return (value or {}).get("name")
+
+    return value
+
+
+def properties_values(properties: Dict, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """{tên property: giá trị đơn giản}, bỏ các giá trị rỗng"""
+    if names is not None:
+        properties = {name: properties[name] for name in names if name in properties}
+    values = {}
+    for name, prop in properties.items():
+        value = property_value(prop)
+        if value is not None:
+            values[name] = value
+    return values
+
+
+def changed_properties(current_values: Dict[str, Any], desired: Dict) -> Dict:
+    """Các property trong desired khác giá trị đã biết (payload PATCH tối thiểu; {} nếu không đổi gì)"""
+    return {name: prop for name, prop in desired.items() if current_values.get(name) != property_value(prop)}
+
+
+def properties_fingerprint(properties: Dict) -> str:
+    """Hash nội dung các property (theo giá trị đã chuẩn hóa, không phụ thuộc thứ tự)"""
+    encoded = json.dumps(properties_values(properties), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+# ---------- Build payload ----------
+
+NUMERIC_FIELDS = frozenset(("spend", "impressions", "clicks", "ctr", "cpc", "cpm"))
+
+# Kiểu ít gặp: converter theo kiểu, giá trị từ record -> payload property (dict mới mỗi lần).
+# title/rich_text/number là đường nóng, được viết thẳng trong PropertyBuilder.build
+_CONVERTERS: Dict[str, Callable[[Any], Dict]] = {
+    "date": lambda v: {"date": {"start": v}},
+    "select": lambda v: {"select": {"name": str(v)}},
+    "url": lambda v: {"url": str(v)},
+    "email": lambda v: {"email": str(v)},
+    "phone_number": lambda v: {"phone_number": str(v)},
+    "checkbox": lambda v: {"checkbox": str(v).lower() in ("1", "true", "yes")},
+}
+
+
+class PropertyBuilder:
+    """Build Notion properties từ record Facebook, kiểu mỗi field chốt 1 lần
+
+    fixed: các property luôn có (tên Notion, field Facebook, kiểu), vd ("Date", "date_start", "date").
+    field_mappings: field Facebook -> tên Notion; title_field được ghi dạng title,
+    NUMERIC_FIELDS dạng number (không đổi được sang số thì rich_text), còn lại rich_text.
+    Field không có giá trị bị bỏ qua.
+
+    types (tên Notion -> kiểu thật, từ notion_schema) thay cho cách đoán kiểu ở trên:
+    mỗi field ghi đúng kiểu của database; giá trị không đổi được sang số thì bỏ
+    property đó thay vì gửi rich_text vào cột number (Notion sẽ từ chối cả dòng).
+
+    Lúc khởi tạo, field được chia theo kiểu thành các tuple cố định: text (kèm key
+    "title"/"rich_text" của payload), number, và kiểu khác (kèm converter). build chỉ lặp
+    qua các tuple đó và điền giá trị vào khung payload của kiểu, không còn if/elif
+    hay kiểm tra kiểu cho từng field. Payload luôn là dict mới vì writer gửi bất đồng bộ.
+    Đo bằng benchmarks/bench_property_builder.py (100k record): ~1.2-1.3x so với if/elif cũ -
+    phần lớn thời gian là tạo dict payload và float(), không bỏ được.
+    """
+
+    def __init__(
+        self,
+        field_mappings: Dict[str, str],
+        title_field: Optional[str] = None,
+        fixed: Sequence[Tuple[str, str, str]] = (),
+        types: Optional[Dict[str, str]] = None,
+    ):
+        fields = [(fb_field, notion_field, kind) for notion_field, fb_field, kind in fixed]
+        for fb_field, notion_field in field_mappings.items():
+            if fb_field == title_field:
+                kind = "title"
+            elif fb_field in NUMERIC_FIELDS:
+                kind = "number"
+            else:
+                kind = "rich_text"
+            fields.append((fb_field, notion_field, kind))
+        if types:
+            fields = [(fb_field, notion_field, types.get(notion_field, kind)) for fb_field, notion_field, kind in fields]
+        self.fields: Tuple[Tuple[str, str, str], ...] = tuple(fields)
+        self.strict = bool(types)
+
+        texts, numbers, others = [], [], []
+        for fb_field, notion_field, kind in self.fields:
+            if kind == "number":
+                numbers.append((notion_field, fb_field))
+            elif kind in _CONVERTERS:
+                others.append((notion_field, fb_field, _CONVERTERS[kind]))
+            else:
+                texts.append((notion_field, fb_field, kind if kind in _TEXT_TYPES else "rich_text"))
+        self._texts: Tuple[Tuple[str, str, str], ...] = tuple(texts)
+        self._numbers: Tuple[Tuple[str, str], ...] = tuple(numbers)
+        self._others: Tuple[Tuple[str, str, Callable[[Any], Dict]], ...] = tuple(others)
+
+    def build(self, record: Dict) -> Dict:
+        get = record.get
+        properties = {}
+        for notion_field, fb_field, key in self._texts:
+            v = get(fb_field)
+            if v is not None:
+                properties[notion_field] = {key: [{"text": {"content": str(v)}}]}
+        for notion_field, fb_field in self._numbers:
+            v = get(fb_field)
+            if v is not None:
+                try:
+                    properties[notion_field] = {"number": float(v)}
+                except (TypeError, ValueError):
+                    if not self.strict:
+                        properties[notion_field] = {"rich_text": [{"text": {"content": str(v)}}]}
+        for notion_field, fb_field, convert in self._others:
+            v = get(fb_field)
+            if v is not None:
+                properties[notion_field] = convert(v)
+        return properties
+
+    def __call__(self, record: Dict) -> Dict:
+        return self.build(record)
@@ -0,0 +1,66 @@
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from module.http_transport import get_notion_transport
+from module.parallel import iter_merged
+
+
+def iter_database_pages(
+    database_id: str,
+    query_filter: Optional[Dict] = None,
+    notion_api_key: Optional[str] = None,
+    page_size: int = 100,
+    notion_version: str = "2025-09-03",
+    filter_properties: Optional[Sequence[str]] = None,
+) -> Iterator[Dict]:
+    """Duyệt toàn bộ pages của database, đi theo next_cursor
+
+    filter_properties (danh sách property id) giới hạn property trả về trong mỗi page,
+    giúp response nhỏ hơn nhiều khi chỉ cần cột khóa.
+    """
+    transport = get_notion_transport(notion_api_key, notion_version)
+    path = f"databases/{database_id}/query"
+    if filter_properties:
+        # Property id của Notion đã ở dạng URL-encoded (vd "%3AUPp") -> ghép trực tiếp, không encode lại
+        path += "?" + "&".join(f"filter_properties={prop_id}" for prop_id in filter_properties)
+    start_cursor = None
+
+    while True:
+        payload = {"page_size": page_size}
+        if query_filter:
+            payload["filter"] = query_filter
+        if start_cursor:
+            payload["start_cursor"] = start_cursor
+
+        response = transport.post(path, json=payload, idempotent=True)
+        response.raise_for_status()
+        data = response.json()
+
+        for page in data.get("results", []):
+            yield page
+
+        if not data.get("has_more"):
+            break
+        start_cursor = data.get("next_cursor")
+
+
+def iter_database_pages_partitioned(
+    database_id: str,
+    partitions: List[Dict],
+    notion_api_key: Optional[str] = None,
+    max_workers: int = 3,
+    **kwargs,
+) -> Iterator[Dict]:
+    """Query song song theo từng filter partition, gộp thành 1 stream
+
+    Các partition phải rời nhau và phủ kín database, nếu không sẽ thiếu/trùng dòng.
+    Partition lỗi sẽ raise lại sau khi các partition khác chạy xong.
+    """
+    errors = []
+    producers = [
+        partial(iter_database_pages, database_id, partition, notion_api_key, **kwargs)
+        for partition in partitions
+    ]
+    yield from iter_merged(producers, max_workers, on_error=lambda index, error: errors.append(error))
+    if errors:
+        raise errors[0]
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from module.http_transport import get_notion_transport
+
+load_dotenv()
+
+DEFAULT_SCHEMA_DIR = os.getenv("NOTION_SCHEMA_CACHE_DIR", ".sync_state/schema")
+DEFAULT_SCHEMA_TTL = float(os.getenv("NOTION_SCHEMA_TTL", "86400"))
+
+# Kiểu property mà PropertyBuilder ghi được
+WRITABLE_TYPES = ("title", "rich_text", "number", "date", "select", "url", "email", "phone_number", "checkbox")
+
+Schema = Dict[str, Dict]  # tên property -> {"id", "type"}
+
+
+def fetch_schema(
+    database_id: str,
+    notion_api_key: Optional[str] = None,
+    notion_version: str = "2025-09-03",
+) -> Schema:
+    """GET /databases/{id} -> {tên: {id, type}}
+
+    Từ Notion-Version 2025-09-03, property nằm ở data source: nếu database không
+    trả về properties thì đọc data source đầu tiên.
+    """
+    transport = get_notion_transport(notion_api_key, notion_version)
+    response = transport.get(f"databases/{database_id}")
+    response.raise_for_status()
+    data = response.json()
+
+    if "properties" not in data and data.get("data_sources"):
+        response = transport.get(f"data_sources/{data['data_sources'][0]['id']}")
+        response.raise_for_status()
+        data = response.json()
+
+    return {
+        name: {"id": prop.get("id"), "type": prop.get("type")}
+        for name, prop in data.get("properties", {}).items()
+    }
+
+
+class SchemaCache:
+    """Cache schema database Notion trên đĩa (mỗi database 1 file JSON), hết hạn sau ttl giây"""
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[float] = None):
+        self.directory = directory or DEFAULT_SCHEMA_DIR
+        self.ttl = DEFAULT_SCHEMA_TTL if ttl is None else ttl
+
+    def _path(self, database_id: str) -> str:
+        return os.path.join(self.directory, f"{database_id.replace('-', '')}.json")
+
+    def load(self, database_id: str) -> Optional[Schema]:
+        """Schema còn hạn trong cache, None nếu chưa có/hết hạn/hỏng"""
+        try:
+            with open(self._path(database_id), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("fetched_at", 0) > self.ttl:
+            return None
+        return cached.get("properties")
+
+    def save(self, database_id: str, schema: Schema):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(database_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "properties": schema}, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def get(
+        self,
+        database_id: str,
+        notion_api_key: Optional[str] = None,
+        notion_version: str = "2025-09-03",
+        refresh: bool = False,
+    ) -> Schema:
+        """Schema từ cache nếu còn hạn, nếu không thì GET lại và lưu cache"""
+        schema = None if refresh else self.load(database_id)
+        if schema is None:
+            schema = fetch_schema(database_id, notion_api_key, notion_version)
+            self.save(database_id, schema)
+        return schema
+
+
+def get_database_schema(
+    database_id: str,
+    notion_api_key: Optional[str] = None,
+    notion_version: str = "2025-09-03",
+    refresh: bool = False,
+) -> Schema:
+    return SchemaCache().get(database_id, notion_api_key, notion_version, refresh)
+
+
+def property_ids(
+    database_id: str,
+    names: Sequence[str],
+    notion_api_key: Optional[str] = None,
+    notion_version: str = "2025-09-03",
+) -> List[str]:
+    """Đổi tên property -> property id (filter_properties chỉ nhận id)"""
+    schema = get_database_schema(database_id, notion_api_key, notion_version)
+    return [schema[name]["id"] for name in names if name in schema]
+
+
+def validate_properties(schema: Schema, names: Sequence[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Kiểm tra các property sắp ghi với schema thật
+
+    Trả về (tên -> kiểu thật, tên -> lỗi): lỗi là property không tồn tại hoặc
+    có kiểu không ghi được (formula, rollup, relation...).
+    """
+    types = {}
+    errors = {}
+    for name in names:
+        prop = schema.get(name)
+        if prop is None:
+            errors[name] = f"Property '{name}' không có trong database"
+        elif prop["type"] not in WRITABLE_TYPES:
+            errors[name] = f"Property '{name}' có kiểu {prop['type']} - không ghi được"
+        else:
+            types[name] = prop["type"]
+    return types, errors
@@ -0,0 +1,192 @@
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from module.notion_properties import changed_properties, properties_fingerprint, properties_values, property_value
+from module.notion_query import iter_database_pages, iter_database_pages_partitioned
+from module.notion_schema import property_ids
+from module.notion_writer import NotionWriter
+from module.sync_state import SyncStateStore
+
+RowKey = Tuple
+
+# Số dòng mỗi lần tra index trong state
+LOOKUP_BATCH = 100
+
+
+def page_key(page: Dict, key_properties: Sequence[str]) -> RowKey:
+    props = page.get("properties", {})
+    return tuple(property_value(props.get(name, {})) for name in key_properties)
+
+
+def properties_key(properties: Dict, key_properties: Sequence[str]) -> RowKey:
+    """Khóa của 1 payload sắp ghi - cùng cách tính với page_key cho page đã có"""
+    return tuple(property_value(properties.get(name, {})) for name in key_properties)
+
+
+def encode_key(key: RowKey) -> str:
+    return "|".join(str(part) for part in key)
+
+
+def decode_key(source_key: str) -> RowKey:
+    return tuple(source_key.split("|"))
+
+
+class NotionUpserter:
+    """Upsert theo khóa: chỉ tạo dòng thiếu, sửa dòng đổi, archive dòng ngoài tập sync
+
+    Index (khóa -> page_id + giá trị đã biết) lấy từ state cục bộ nếu có,
+    nếu không thì đọc từ Notion. Mỗi lệnh ghi mang meta {scope, source_key, values}
+    để writer (có state) lưu lại kết quả, kể cả khi replay từ dead-letter.
+
+    Có state: index và tập khóa đã gặp nằm trong SQLite, tra theo lô khi dòng tới,
+    nên bộ nhớ không tăng theo số dòng. Không có state: index giữ trong dict.
+    """
+
+    def __init__(
+        self,
+        writer: Optional[NotionWriter],
+        database_id: str,
+        key_properties: Sequence[str],
+        state: Optional[SyncStateStore] = None,
+    ):
+        self.writer = writer
+        self.database_id = database_id
+        self.key_properties = list(key_properties)
+        self.state = state
+        self.index: Dict[RowKey, Dict] = {}
+        self.duplicates = []
+        self.source = None
+        self.seen = set()
+        self.stats = {"unchanged": 0, "stale": 0, "duplicates": 0}
+
+    def load_index(self, notion_api_key: Optional[str] = None, **kwargs) -> int:
+        """Nạp index: ưu tiên state cục bộ (0 request), fallback query Notion"""
+        if self.state is not None:
+            self.state.clear_seen(self.database_id)
+            count = self.state.count(self.database_id, with_page_id=True)
+            if count:
+                self.source = "state"
+                return count
+
+        return self.rebuild_index(notion_api_key, **kwargs)
+
+    def rebuild_index(
+        self,
+        notion_api_key: Optional[str] = None,
+        projection: Optional[Sequence[str]] = None,
+        partitions: Optional[List[Dict]] = None,
+    ) -> int:
+        """Đọc lại toàn bộ index từ Notion và ghi đè state cục bộ (dùng cả khi sửa lệch)
+
+        projection: chỉ lấy các property này (tên), partitions: query song song theo filter rời nhau.
+        """
+        self.source = "notion"
+        self.index = {}
+        self.duplicates = []
+        filter_properties = property_ids(self.database_id, projection, notion_api_key) if projection else None
+        if partitions:
+            pages = iter_database_pages_partitioned(
+                self.database_id, partitions, notion_api_key, filter_properties=filter_properties
+            )
+        else:
+            pages = iter_database_pages(self.database_id, notion_api_key=notion_api_key, filter_properties=filter_properties)
+
+        if self.state is not None:
+            # Nạp thẳng vào state theo lô (không giữ index trong bộ nhớ); lần chạy sau không cần query
+            return self.state.replace_scope(
+                self.database_id,
+                (
+                    (encode_key(page_key(page, self.key_properties)), page["id"], properties_values(page.get("properties", {})))
+                    for page in pages
+                ),
+                on_duplicate=lambda source_key, page_id: self.duplicates.append(page_id),
+            )
+
+        for page in pages:
+            key = page_key(page, self.key_properties)
+            if key in self.index:
+                self.duplicates.append(page["id"])
+            else:
+                values = properties_values(page.get("properties", {}))
+                self.index[key] = {"page_id": page["id"], "values": values}
+        return len(self.index)
+
+    def _lookup(self, keys: List[RowKey]) -> Dict[RowKey, Dict]:
+        """Entry index của các khóa (khóa chưa có page thì vắng mặt) và đánh dấu đã gặp"""
+        if self.state is None:
+            self.seen.update(keys)
+            return {key: self.index[key] for key in keys if key in self.index}
+        source_keys = [encode_key(key) for key in keys]
+        self.state.mark_seen(self.database_id, source_keys)
+        found = self.state.lookup(self.database_id, source_keys)
+        return {key: found[source_key] for key, source_key in zip(keys, source_keys) if source_key in found}
+
+    def changes(self, entry: Dict, properties: Dict, fingerprint: str) -> Dict:
+        """Property cần PATCH so với lần ghi trước ({} = không đổi)
+
+        Fingerprint trùng -> không đổi; có giá trị đã biết (query hoặc state) -> chỉ property
+        khác giá trị; không biết gì (state cũ chỉ có fingerprint) -> gửi đủ properties.
+        """
+        if entry.get("fingerprint") == fingerprint:
+            return {}
+        if entry["values"]:
+            return changed_properties(entry["values"], properties)
+        return properties
+
+    def write(self, rows: Iterable[Tuple[RowKey, Dict, str]]) -> int:
+        """Tạo dòng thiếu, sửa dòng đổi; rows có thể là stream (ghi ngay khi có dòng)"""
+        count = 0
+        for batch in _batches(rows, LOOKUP_BATCH):
+            known = self._lookup([key for key, _, _ in batch])
+            for key, properties, label in batch:
+                count += 1
+                self._write_row(key, properties, label, known.get(key))
+        return count
+
+    def _write_row(self, key: RowKey, properties: Dict, label: str, entry: Optional[Dict]):
+        fingerprint = properties_fingerprint(properties)
+        meta = {
+            "scope": self.database_id,
+            "source_key": encode_key(key),
+            "values": properties_values(properties),
+            "fingerprint": fingerprint,
+        }
+        if entry is None:
+            self.writer.create_page(self.database_id, properties, label, meta)
+            return
+        # PATCH chỉ mang property đổi; meta vẫn giữ đủ giá trị để state khớp với Notion.
+        # base_fingerprint: fingerprint của state lúc tính diff (replay dead-letter dùng để biết lệnh đã cũ chưa)
+        changes = self.changes(entry, properties, fingerprint)
+        if changes:
+            meta["base_fingerprint"] = entry.get("fingerprint")
+            self.writer.update_page(entry["page_id"], changes, label, meta)
+        else:
+            self.stats["unchanged"] += 1
+
+    def archive_stale(self, in_scope: Optional[Callable[[RowKey], bool]] = None):
+        """Archive dòng cũ không xuất hiện trong write() và dòng trùng khóa
+
+        in_scope giới hạn những dòng cũ được phép archive (ví dụ bỏ qua account lỗi fetch).
+        """
+        if self.state is None:
+            stale = ((key, entry["page_id"]) for key, entry in self.index.items() if key not in self.seen)
+        else:
+            stale = ((decode_key(source_key), page_id) for source_key, page_id in self.state.iter_unseen(self.database_id))
+        for key, page_id in stale:
+            if in_scope is None or in_scope(key):
+                self.stats["stale"] += 1
+                meta = {"scope": self.database_id, "source_key": encode_key(key)}
+                self.writer.archive_page(page_id, encode_key(key), meta)
+
+        for page_id in self.duplicates:
+            self.stats["duplicates"] += 1
+            self.writer.archive_page(page_id, "duplicate")
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
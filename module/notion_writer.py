@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from module.dead_letter import DeadLetterQueue, get_dead_letter_queue
+from module.http_transport import get_notion_transport
+from module.log import get_logger
+from module.metrics import WRITE_STAGES, get_metrics
+from module.profiling import profile_stage
+from module.sync_state import SyncStateStore
+
+load_dotenv()
+
+DEFAULT_WORKERS = int(os.getenv("NOTION_WRITE_WORKERS", "4"))
+
+log = get_logger("notion_writer")
+
+
+class NotionWriter:
+    """Ghi Notion song song (create/update/archive)
+
+    Tốc độ do RateGovernor của transport quyết định (token bucket + 429/Retry-After),
+    nên writer không cần sleep cố định giữa các request. Lỗi tạm thời được transport
+    retry; lệnh vẫn lỗi sau khi hết retry được ghi vào dead-letter queue kèm `meta`.
+    Nếu có `state`, mỗi lệnh ghi thành công kèm meta {scope, source_key...} được lưu vào state.
+    """
+
+    def __init__(
+        self,
+        notion_api_key: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        notion_version: str = "2025-09-03",
+        on_done: Optional[Callable[[str, str, bool], None]] = None,
+        dead_letters: Optional[DeadLetterQueue] = None,
+        state: Optional[SyncStateStore] = None,
+    ):
+        self.notion_api_key = notion_api_key or os.getenv("NOTION_API_KEY")
+        self.transport = get_notion_transport(self.notion_api_key, notion_version)
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self.on_done = on_done
+        self.dead_letters = dead_letters or get_dead_letter_queue()
+        self.state = state
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Giới hạn số việc đang chờ để không giữ cả dataset trong hàng đợi
+        self._slots = threading.BoundedSemaphore(self.max_workers * 4)
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "updated": 0, "archived": 0, "failed": 0}
+
+    # ---------- Public API ----------
+
+    def create_page(self, database_id: str, properties: Dict, label: str = "", meta: Optional[Dict] = None) -> Future:
+        payload = {"parent": {"database_id": database_id}, "properties": properties}
+        return self.submit("created", "POST", "pages", payload, label, meta)
+
+    def update_page(self, page_id: str, properties: Dict, label: str = "", meta: Optional[Dict] = None) -> Future:
+        payload = {"properties": properties}
+        return self.submit("updated", "PATCH", f"pages/{page_id}", payload, label, meta)
+
+    def archive_page(self, page_id: str, label: str = "", meta: Optional[Dict] = None) -> Future:
+        payload = {"archived": True}
+        return self.submit("archived", "PATCH", f"pages/{page_id}", payload, label, meta)
+
+    def submit(
+        self, action: str, method: str, path: str, payload: Dict, label: str = "", meta: Optional[Dict] = None
+    ) -> Future:
+        """Gửi 1 lệnh ghi bất kỳ (dùng khi replay dead-letter)"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._send, action, method, path, payload, label, meta)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self) -> Dict:
+        """Chờ tất cả request hoàn thành, trả về thống kê"""
+        self._executor.shutdown(wait=True)
+        return dict(self.stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- Internal ----------
+
+    def _send(
+        self, action: str, method: str, path: str, payload: Dict, label: str, meta: Optional[Dict]
+    ) -> Optional[Dict]:
+        """Gửi 1 request ghi; trả về page object khi thành công, None khi lỗi"""
+        start = time.perf_counter()
+        try:
+            with profile_stage(WRITE_STAGES.get(action, action)):
+                response = self.transport.request(method, path, json=payload, timeout=10)
+                response.raise_for_status()
+                result = response.json()
+        except Exception as e:
+            error = str(e)
+            if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+                error = f"{e.response.status_code}: {e.response.text[:300]}"
+            log.warning("⚠️ Lỗi ghi Notion", action=action, label=label, error=error[:300])
+            self.dead_letters.append(action, method, path, payload, label, error, meta)
+            result = None
+
+        ok = result is not None
+        get_metrics().observe_write(action, time.perf_counter() - start, ok)
+        if ok and self.state is not None and meta:
+            self.state.apply_write(action, meta, result)
+
+        with self._lock:
+            self.stats[action if ok else "failed"] += 1
+
+        if self.on_done:
+            self.on_done(action, label, ok)
+        return result
@@ -0,0 +1,258 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Union
+
+from module.metrics import get_metrics
+from module.pipeline import run_pipeline
+from module.rate_governor import get_governor
+from module.sync_config import SyncConfig, parse_field_mappings
+from module.sync_state import SyncStateStore
+
+# Cấu hình mặc định theo loại job (giống các script sync_*.py)
+DAILY_MAPPINGS = {"spend": "Spend", "impressions": "Impressions", "clicks": "Clicks", "ctr": "CTR", "cpc": "CPC"}
+CAMPAIGN_MAPPINGS = {
+    "campaign_name": "Campaign Name",
+    "campaign_id": "Campaign ID",
+    "spend": "Spend",
+    "impressions": "Impressions",
+    "clicks": "Clicks",
+    "ctr": "CTR (%)",
+    "cpc": "CPC",
+    "account_id": "Account ID",
+}
+FACT_MAPPINGS = {
+    "campaign_name": "Campaign Name",
+    "spend": "Spend",
+    "impressions": "Impressions",
+    "clicks": "Clicks",
+    "ctr": "CTR (%)",
+    "cpc": "CPC",
+}
+
+JOB_KINDS = {
+    "daily": dict(
+        level="account",
+        fields="spend,impressions,clicks,ctr,cpc",
+        mappings=DAILY_MAPPINGS,
+        key_properties=["Account ID", "Date"],
+        fixed_properties=[("Account ID", "account_id", "title"), ("Date", "date_start", "date")],
+        time_increment=1,
+    ),
+    "campaign": dict(
+        level="campaign",
+        fields="campaign_name,campaign_id,spend,impressions,clicks,ctr,cpc",
+        mappings=CAMPAIGN_MAPPINGS,
+        title_field="campaign_name",
+        archive_stale=False,
+        index_projection=True,
+    ),
+    # Campaign × ngày; account × ngày và tổng campaign tính từ đây qua "rollups"
+    "fact": dict(
+        level="campaign",
+        fields="campaign_name,campaign_id,spend,impressions,clicks,ctr,cpc",
+        mappings=FACT_MAPPINGS,
+        title_field="campaign_name",
+        key_properties=["Account ID", "Campaign ID", "Date"],
+        fixed_properties=[
+            ("Account ID", "account_id", "rich_text"),
+            ("Campaign ID", "campaign_id", "rich_text"),
+            ("Date", "date_start", "date"),
+        ],
+        time_increment=1,
+    ),
+}
+
+SYNC_MODES = ("upsert", "replace", "create")
+
+
+@dataclass
+class Manifest:
+    """Job theo tên (giữ thứ tự manifest) + số lane chạy song song + ngân sách request chung"""
+
+    jobs: Dict[str, SyncConfig]
+    max_parallel: int = 2
+    budget: Dict[str, float] = field(default_factory=dict)
+
+
+def _as_list(value: Union[str, Sequence[str], None]) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def job_config(entry: Dict, defaults: Optional[Dict] = None) -> SyncConfig:
+    """1 job trong manifest -> SyncConfig
+
+    Secrets không nằm trong manifest: job chỉ ghi tên biến môi trường
+    (access_token_env, notion_api_key_env, database_env).
+    """
+    entry = dict(defaults or {}, **entry)
+    rollups = entry.pop("rollups", None) or {}
+    name = entry.get("name")
+    kind = entry.get("kind", "daily")
+    if not name:
+        raise ValueError("Job thiếu 'name'")
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Job '{name}': kind '{kind}' không hợp lệ ({', '.join(JOB_KINDS)})")
+    preset = JOB_KINDS[kind]
+
+    mapping = entry.get("mapping")
+    if isinstance(mapping, str):
+        field_mappings = parse_field_mappings(mapping, preset["mappings"])
+    else:
+        field_mappings = dict(mapping or preset["mappings"])
+
+    config = SyncConfig(
+        title=f"[{name}] {kind.upper()} → NOTION",
+        database_id=entry.get("database_id") or os.getenv(entry.get("database_env", ""), ""),
+        key_properties=list(preset.get("key_properties", [])),
+        level=preset["level"],
+        facebook_fields=_as_list(entry.get("fields", preset["fields"])),
+        field_mappings=field_mappings,
+        account_ids=_as_list(entry.get("accounts")),
+        access_token=os.getenv(entry.get("access_token_env", "FACEBOOK_ACCESS_TOKEN")),
+        notion_api_key=os.getenv(entry.get("notion_api_key_env", "NOTION_API_KEY")),
+        start_date=entry.get("start_date", os.getenv("START_DATE", "2025-10-01")),
+        end_date=entry.get("end_date", os.getenv("END_DATE", "2025-10-29")),
+        title_field=preset.get("title_field"),
+        fixed_properties=list(preset.get("fixed_properties", [])),
+        time_increment=preset.get("time_increment"),
+        sync_mode=entry.get("mode", "upsert").strip().lower(),
+        archive_stale=entry.get("archive_stale", preset.get("archive_stale", True)),
+        date_mode=entry.get("date_mode", "static").strip().lower(),
+        lookback_days=int(entry.get("lookback_days", 7)),
+        window_days=int(entry.get("window_days", 7)),
+        index_projection=preset.get("index_projection", False),
+        write_workers=entry.get("write_workers"),
+        insights_cache=bool(entry.get("insights_cache", True)),
+        graph_batch_size=entry.get("batch_size"),
+    )
+    if kind == "campaign":
+        config.key_properties = [config.field_mappings.get("campaign_id", "Campaign ID")]
+        config.label = lambda record: f"{record.get('campaign_name', 'Unknown')[:50]} (Account: {record.get('account_id', 'Unknown')})"
+    elif kind == "fact":
+        config.label = lambda record: f"{record.get('campaign_name', 'Unknown')[:40]} - {record.get('date_start', '')}"
+    else:
+        config.label = lambda record: f"{record['account_id']} - {record.get('date_start', '')}"
+
+    if config.sync_mode not in SYNC_MODES:
+        raise ValueError(f"Job '{name}': mode '{config.sync_mode}' không hợp lệ ({', '.join(SYNC_MODES)})")
+    if config.date_mode == "watermark" and config.sync_mode != "upsert":
+        raise ValueError(f"Job '{name}': date_mode=watermark cần mode=upsert")
+
+    # "rollups": {"daily": {...}, "campaign": {...}} - job con ghi bảng tổng hợp, không fetch riêng
+    if rollups and kind != "fact":
+        raise ValueError(f"Job '{name}': rollups chỉ dùng được với kind=fact")
+    for rollup_kind, rollup_entry in rollups.items():
+        if rollup_kind not in ("daily", "campaign"):
+            raise ValueError(f"Job '{name}': rollup '{rollup_kind}' không hợp lệ (daily, campaign)")
+        base = {key: value for key, value in entry.items() if key not in ("database_id", "database_env", "fields", "mapping", "mode", "archive_stale")}
+        config.rollups[rollup_kind] = job_config(dict(base, name=f"{name}:{rollup_kind}", kind=rollup_kind, **rollup_entry))
+    return config
+
+
+def load_manifest(path: str) -> Manifest:
+    """Đọc manifest JSON: {"max_parallel", "budget", "defaults", "jobs": [...]}"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    defaults = raw.get("defaults", {})
+    jobs: Dict[str, SyncConfig] = OrderedDict()
+    for entry in raw.get("jobs", []):
+        config = job_config(entry, defaults)
+        if entry["name"] in jobs:
+            raise ValueError(f"Tên job '{entry['name']}' bị trùng trong manifest")
+        jobs[entry["name"]] = config
+
+    # Nhiều job ghi cùng 1 database: không được xóa cả database, chỉ archive dòng của mình
+    for lane in group_by_database(jobs):
+        if len(lane) < 2:
+            continue
+        for name in lane:
+            for config in [jobs[name]] + list(jobs[name].rollups.values()):
+                if config.sync_mode == "replace":
+                    raise ValueError(f"Job '{name}': mode=replace xóa cả database đang dùng chung với job khác")
+                config.archive_own_accounts_only = True
+
+    return Manifest(jobs=jobs, max_parallel=int(raw.get("max_parallel", 2)), budget=raw.get("budget", {}))
+
+
+def group_by_database(jobs: Dict[str, SyncConfig]) -> List[List[str]]:
+    """Tên job cùng database vào 1 lane (chạy tuần tự), các lane chạy song song
+
+    Database của rollups cũng tính: job fact ghi vào database daily thì chung lane với job daily.
+    """
+    lanes: List[List[str]] = []
+    lane_databases: List[set] = []
+    for name, config in jobs.items():
+        databases = {c.database_id.replace("-", "") for c in [config] + list(config.rollups.values())}
+        merged, merged_databases = [name], set(databases)
+        for index in reversed(range(len(lanes))):
+            if lane_databases[index] & databases:
+                merged = lanes.pop(index) + merged
+                merged_databases |= lane_databases.pop(index)
+        lanes.append(merged)
+        lane_databases.append(merged_databases)
+    # Giữ thứ tự manifest
+    order = {name: index for index, name in enumerate(jobs)}
+    return sorted((sorted(lane, key=order.get) for lane in lanes), key=lambda lane: order[lane[0]])
+
+
+def apply_budget(budget: Dict[str, float]):
+    """Ngân sách chung cho mọi job: notion_rate/notion_burst, facebook_rate (0 = chỉ theo header usage)"""
+    governor = get_governor()
+    if "notion_rate" in budget:
+        governor.configure("notion", float(budget["notion_rate"]), float(budget.get("notion_burst", 0)))
+    if "facebook_rate" in budget:
+        governor.configure("graph", float(budget["facebook_rate"]), float(budget.get("facebook_burst", 0)))
+
+
+def run_jobs(manifest: Manifest, only: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
+    """Chạy các job trên pool max_parallel thread, dùng chung RateGovernor và SyncStateStore
+
+    Mọi HttpTransport trong process đi qua cùng một governor, nên tổng số request
+    Notion/Graph của cả fleet nằm trong một ngân sách và khi một job bị 429 thì
+    tất cả cùng giãn ra thay vì mỗi job tự vượt ngưỡng.
+    """
+    jobs = OrderedDict((name, config) for name, config in manifest.jobs.items() if not only or name in only)
+    apply_budget(manifest.budget)
+
+    results: Dict[str, Dict] = {}
+    results_lock = threading.Lock()
+
+    def run_lane(lane: List[str], state: SyncStateStore):
+        for name in lane:
+            start = time.perf_counter()
+            try:
+                stats = run_pipeline(jobs[name], state=state, report=False)
+                error = None if stats is not None else "cấu hình/schema không hợp lệ"
+            except Exception as e:
+                stats, error = None, str(e)
+            with results_lock:
+                results[name] = {
+                    "stats": stats or {},
+                    "error": error,
+                    "seconds": round(time.perf_counter() - start, 1),
+                }
+
+    lanes = group_by_database(jobs)
+    with SyncStateStore() as state:
+        with ThreadPoolExecutor(max_workers=max(1, min(manifest.max_parallel, len(lanes) or 1))) as executor:
+            for future in [executor.submit(run_lane, lane, state) for lane in lanes]:
+                future.result()
+
+    ordered = {name: results[name] for name in jobs if name in results}
+    # 1 báo cáo metrics cho cả fleet: tổng số dòng + kết quả từng job
+    totals: Dict[str, float] = {}
+    for result in ordered.values():
+        for key, value in result["stats"].items():
+            totals[key] = totals.get(key, 0) + value
+    get_metrics().emit(extra=dict(totals, jobs=ordered))
+    return ordered
@@ -0,0 +1,69 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+_DONE = object()
+
+
+def iter_merged(
+    producers: Iterable[Callable[[], Iterable]],
+    max_workers: int,
+    buffer_size: int = 1000,
+    on_complete: Optional[Callable[[int, int], None]] = None,
+    on_error: Optional[Callable[[int, Exception], None]] = None,
+) -> Iterator:
+    """Chạy nhiều generator song song trên pool giới hạn, gộp kết quả thành 1 stream
+
+    Item được đẩy qua queue có giới hạn nên producer tự chậm lại khi consumer ghi không kịp.
+    producers có thể là generator: chỉ lấy producer tiếp theo khi có worker rảnh,
+    nên bộ nhớ không tăng theo số producer.
+    on_complete(index, count) / on_error(index, exc) được gọi từ thread của producer.
+    """
+    pending = enumerate(producers)
+    items: "queue.Queue" = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(index: int, producer: Callable[[], Iterable]):
+        count = 0
+        try:
+            for item in producer():
+                if not put(item):
+                    return
+                count += 1
+            if on_complete:
+                on_complete(index, count)
+        except Exception as e:
+            if on_error:
+                on_error(index, e)
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def submit_next() -> int:
+        for index, producer in pending:
+            executor.submit(worker, index, producer)
+            return 1
+        return 0
+
+    try:
+        running = sum(submit_next() for _ in range(max(1, max_workers)))
+        while running:
+            item = items.get()
+            if item is _DONE:
+                running += submit_next() - 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
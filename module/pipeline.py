@@ -0,0 +1,382 @@
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from module.date_windows import count_windows, plan_date_ranges, plan_windows
+from module.facebook_insights import fetch_insights_windows
+from module.insights_cache import InsightsCache
+from module.log import ProgressLog, flush_logs, get_logger
+from module.metrics import get_metrics
+from module.notion_database_clearer import NotionDatabaseClearer
+from module.notion_properties import PropertyBuilder, properties_fingerprint, properties_values
+from module.notion_schema import SchemaCache, validate_properties
+from module.notion_upsert import NotionUpserter, RowKey, encode_key, properties_key
+from module.notion_writer import NotionWriter
+from module.rollups import ROLLUP_KINDS, InsightsRollup, required_fields, unsupported_fields
+from module.sync_config import SyncConfig
+from module.sync_state import SyncStateStore
+
+Row = Tuple[RowKey, Dict, str]  # (khóa, properties, label)
+DateRanges = Dict[str, Tuple[str, str]]
+# (config, date_ranges, failed, cache) -> record; mặc định insights_source
+RecordSource = Callable[[SyncConfig, DateRanges, Set[str], Optional[InsightsCache]], Iterable[Dict]]
+
+WRITE_VERBS = {"created": "Tạo", "updated": "Cập nhật", "archived": "Archive"}
+
+log = get_logger("pipeline")
+
+
+def write_logger(progress: ProgressLog) -> Callable[[str, str, bool], None]:
+    """on_done cho NotionWriter: đếm vào progress, từng dòng chỉ log ở mức DEBUG"""
+    def on_done(action: str, label: str, ok: bool):
+        progress.add(action if ok else "failed")
+        if ok:
+            log.debug(f"✅ {WRITE_VERBS.get(action, action)}", label=label)
+    return on_done
+
+
+# ---------- Source ----------
+
+def insights_source(
+    config: SyncConfig, date_ranges: DateRanges, failed: Set[str], cache: Optional[InsightsCache] = None
+) -> Iterator[Dict]:
+    """Record Facebook Insights theo từng (account, cửa sổ ngày), trả ngay khi mỗi trang về
+
+    Chỉ chia cửa sổ khi breakdown theo ngày; số liệu tổng (không time_increment)
+    phải lấy nguyên khoảng ngày, nếu không sẽ ra nhiều dòng cho cùng 1 khóa.
+    Có cache thì ngày đã chốt/còn hạn lấy từ đĩa, không hỏi lại Graph.
+    """
+    fields = list(config.facebook_fields)
+    if "account_id" not in fields:
+        fields.append("account_id")
+    params = {"fields": ",".join(fields), "level": config.level}
+    if config.time_increment:
+        params["time_increment"] = config.time_increment
+        windows = plan_windows(date_ranges, config.window_days)
+        window_count = count_windows(date_ranges, config.window_days)
+    else:
+        windows = [(account_id, since, until) for account_id, (since, until) in date_ranges.items()]
+        window_count = len(windows)
+
+    print(f"   📊 Fields: {params['fields']}")
+    print(f"   {window_count} cửa sổ")
+    return fetch_insights_windows(
+        windows, params, config.access_token, failed=failed, cache=cache, batch_size=config.graph_batch_size
+    )
+
+
+# ---------- Transform ----------
+
+def check_key_columns(config: SyncConfig, name: str = "") -> None:
+    """ValueError nếu có cột khóa mà mapping không ghi ra
+
+    Thiếu cột khóa -> mọi record cùng khóa (None, ...) và bị gộp vào 1 dòng Notion.
+    """
+    produced = {notion_field for notion_field, _, _ in config.fixed_properties}
+    produced.update(config.field_mappings.values())
+    missing = [key for key in config.key_properties if key not in produced]
+    if missing:
+        where = f"{name}: " if name else ""
+        raise ValueError(
+            f"{where}cột khóa {', '.join(missing)} không có trong mapping ({', '.join(sorted(produced))})"
+        )
+
+
+def resolve_property_types(config: SyncConfig) -> Optional[Dict[str, str]]:
+    """Kiểu thật của các property sẽ ghi, theo schema database (cache trên đĩa)
+
+    Cột khóa không có trong mapping -> ValueError. Property không có/không ghi được
+    bị bỏ khỏi mapping kèm cảnh báo; lỗi ở cột khóa thì trả về None (dừng).
+    Không đọc được schema -> {} (đoán kiểu theo tên field như cũ).
+    """
+    check_key_columns(config)
+    names = [notion_field for notion_field, _, _ in config.fixed_properties] + list(config.field_mappings.values())
+    cache = SchemaCache()
+    try:
+        cached = cache.load(config.database_id)
+        schema = cached if cached is not None else cache.get(config.database_id, config.notion_api_key, refresh=True)
+        types, errors = validate_properties(schema, names)
+        if errors and cached is not None:
+            # Cache có thể cũ hơn database (vừa thêm cột) -> đọc lại 1 lần
+            schema = cache.get(config.database_id, config.notion_api_key, refresh=True)
+            types, errors = validate_properties(schema, names)
+    except Exception as e:
+        print(f"⚠️ Không đọc được schema database ({str(e)[:80]}) - đoán kiểu theo tên field")
+        return {}
+
+    for name, error in errors.items():
+        if name in config.key_properties:
+            print(f"❌ {error} (cột khóa)")
+            return None
+        print(f"⚠️ {error} - bỏ qua")
+    config.field_mappings = {fb: notion for fb, notion in config.field_mappings.items() if notion not in errors}
+    config.fixed_properties = [prop for prop in config.fixed_properties if prop[0] not in errors]
+    return types
+
+
+def build_rows(
+    records: Iterable[Dict],
+    config: SyncConfig,
+    counter: Dict[str, int],
+    types: Optional[Dict[str, str]] = None,
+) -> Iterator[Row]:
+    """record Facebook -> (khóa, properties, label); đếm số record vào counter["fetched"]"""
+    build = PropertyBuilder(config.field_mappings, config.title_field, config.fixed_properties, types).build
+    key_properties = config.key_properties
+    label = config.label
+    for record in records:
+        counter["fetched"] += 1
+        properties = build(record)
+        yield properties_key(properties, key_properties), properties, label(record)
+
+
+# ---------- Sink ----------
+
+def create_rows(writer: NotionWriter, config: SyncConfig, rows: Iterable[Row]):
+    """Chỉ tạo page mới (replace/create); vẫn ghi khóa -> page_id vào state"""
+    for key, properties, label in rows:
+        meta = {
+            "scope": config.database_id,
+            "source_key": encode_key(key),
+            "values": properties_values(properties),
+            "fingerprint": properties_fingerprint(properties),
+        }
+        writer.create_page(config.database_id, properties, label, meta)
+
+
+def index_partitions(config: SyncConfig) -> Optional[List[Dict]]:
+    """Mỗi account 1 partition + 1 partition cho các dòng còn lại (query index song song)
+
+    Kiểu cột account (title/rich_text) lấy từ schema đã cache ở resolve_property_types.
+    """
+    prop = config.index_partition_property
+    if not prop:
+        return None
+    schema = SchemaCache().load(config.database_id) or {}
+    kind = schema.get(prop, {}).get("type") or "rich_text"
+    partitions = [{"property": prop, kind: {"equals": account_id}} for account_id in config.account_ids]
+    partitions.append({"and": [
+        {"property": prop, kind: {"does_not_equal": account_id}} for account_id in config.account_ids
+    ]})
+    return partitions
+
+
+def stale_scope(config: SyncConfig, date_ranges: DateRanges, failed: Set[str]):
+    """Dòng cũ nào được phép archive: bỏ account lỗi fetch; watermark chỉ trong cửa sổ vừa lấy"""
+    def in_scope(key: RowKey) -> bool:
+        account_id, date_str = key[0], key[-1]
+        if account_id in failed:
+            return False
+        if config.archive_own_accounts_only and account_id not in config.account_ids:
+            return False
+        if config.date_mode != "watermark":
+            return True
+        since, until = date_ranges.get(account_id, (None, None))
+        return bool(since and date_str) and since <= date_str <= until
+    return in_scope
+
+
+# ---------- Engine ----------
+
+def run_pipeline(
+    config: SyncConfig,
+    state: Optional[SyncStateStore] = None,
+    report: bool = True,
+    source: Optional[RecordSource] = None,
+    date_ranges: Optional[DateRanges] = None,
+) -> Optional[Dict]:
+    """Facebook Insights → build properties → Notion, nối bằng generator/queue có giới hạn
+
+    Record được ghi ngay khi trang Facebook về (không giữ cả dataset trong list);
+    dòng cũ chỉ bị archive sau khi stream kết thúc và có dữ liệu.
+    Truyền `state` để dùng chung 1 SyncStateStore giữa nhiều job (không bị đóng ở đây).
+    report=True: cuối run ghi metrics từng stage ra JSON + Prometheus textfile (module/metrics.py).
+    source/date_ranges: thay nguồn Facebook và khoảng ngày (bảng tổng hợp của config.rollups).
+    """
+    metrics = get_metrics()
+    print("\n" + "=" * 70)
+    print(f"🚀 {config.title}")
+    print("=" * 70)
+    print(f"\n📊 Configuration:")
+    print(f"   Ad Accounts: {len(config.account_ids)} accounts")
+    print(f"   Date Range: {config.start_date} to {config.end_date}")
+    print(f"   Date Mode: {config.date_mode}" + (f" (lookback {config.lookback_days} ngày)" if config.date_mode == "watermark" else ""))
+    print(f"   Sync Mode: {config.sync_mode}")
+    print(f"   Facebook Fields: {', '.join(config.facebook_fields)}")
+    print(f"   Notion Fields: {', '.join(config.field_mappings.values())}")
+    print(f"   Notion DB: {config.database_id[:20]}...")
+
+    errors = config.validate()
+    if errors:
+        for error in errors:
+            print(f"\n❌ {error}")
+        return None
+
+    rollup = prepare_rollups(config)
+    if rollup is False:
+        return None
+
+    types = resolve_property_types(config)
+    if types is None:
+        return None
+
+    if config.sync_mode == "replace":
+        print("\n🗑️  Bước 0: Xóa dữ liệu cũ...")
+        print("-" * 70)
+        NotionDatabaseClearer(config.notion_api_key).clear_database_parallel(config.database_id)
+
+    counter = {"fetched": 0}
+    failed: Set[str] = set()
+    upsert_stats = {}
+    shared_state = state
+
+    with nullcontext(state) if state is not None else SyncStateStore() as state:
+        if config.sync_mode == "replace":
+            # Page cũ đã bị archive -> index cục bộ không còn đúng
+            state.replace_scope(config.database_id, [])
+
+        if date_ranges is None:
+            date_ranges = plan_date_ranges(
+                config.account_ids, config.start_date, config.end_date, config.date_mode,
+                state, config.database_id, config.lookback_days
+            )
+
+        # Ngày đã qua cửa sổ attribution không đổi nữa -> cache vĩnh viễn
+        cache = InsightsCache(final_after_days=config.lookback_days) if config.insights_cache else None
+        progress = ProgressLog(log, "📤 Tiến độ ghi Notion")
+        with nullcontext() if cache is None else cache, NotionWriter(
+            config.notion_api_key, config.write_workers, on_done=write_logger(progress), state=state
+        ) as writer:
+            upserter = None
+            if config.sync_mode == "upsert":
+                print("\n📋 Bước 1: Nạp index dòng hiện có...")
+                print("-" * 70)
+                upserter = NotionUpserter(writer, config.database_id, config.key_properties, state)
+                try:
+                    with metrics.stage("query"):
+                        existing = upserter.load_index(
+                            config.notion_api_key,
+                            projection=config.key_properties if config.index_projection else None,
+                            partitions=index_partitions(config),
+                        )
+                    metrics.add_stage("query", items=existing, calls=0)
+                except Exception as e:
+                    flush_logs()
+                    print(f"❌ Query lỗi: {str(e)[:80]}")
+                    print("\n⚠️ Không đọc được dữ liệu hiện có - dừng để tránh tạo trùng")
+                    return None
+                print(f"✅ Index: {existing} dòng (nguồn: {upserter.source})")
+
+            print(f"\n🔄 Bước 2: Lấy Facebook → ghi Notion ({config.sync_mode})...")
+            print("-" * 70)
+            records = (source or insights_source)(config, date_ranges, failed, cache)
+            if rollup is not None:
+                records = rollup.tap(records)
+            records = metrics.timed_iter("fetch", records)
+            rows = metrics.timed_iter("transform", build_rows(records, config, counter, types), exclude="fetch")
+
+            if upserter is None:
+                create_rows(writer, config, rows)
+            else:
+                upserter.write(rows)
+                if not counter["fetched"]:
+                    flush_logs()
+                    print("\n⚠️ Không lấy được dữ liệu từ Facebook - không archive")
+                elif config.archive_stale:
+                    upserter.archive_stale(stale_scope(config, date_ranges, failed))
+                upsert_stats = dict(upserter.stats)
+
+        # Chỉ tiến watermark khi mọi lệnh ghi đều thành công
+        if config.date_mode == "watermark" and writer.stats["failed"] == 0:
+            for account_id, (since, until) in date_ranges.items():
+                if account_id not in failed:
+                    state.set_watermark(config.database_id, account_id, until)
+
+    progress.close()
+    stats = dict(writer.stats, fetched=counter["fetched"], unchanged=upsert_stats.get("unchanged", 0))
+    if cache is not None:
+        stats.update(cache_hit_days=cache.stats["hit_days"], cache_miss_days=cache.stats["miss_days"])
+    print_summary(config, stats, date_ranges, failed)
+    if rollup is not None and counter["fetched"]:
+        stats.update(run_rollups(config, rollup, shared_state, date_ranges, failed))
+    if report:
+        metrics.emit(extra=stats)
+    return stats
+
+
+# ---------- Rollups ----------
+
+def prepare_rollups(config: SyncConfig):
+    """Kiểm tra config.rollups và bổ sung field cần fetch; None nếu không có rollup, False nếu cấu hình sai
+
+    Bảng tổng hợp dùng cùng account với job campaign × ngày; field không cộng được
+    từ số theo campaign × ngày (reach, frequency...) bị bỏ kèm cảnh báo.
+    Mapping của rollup thiếu cột khóa -> ValueError.
+    """
+    if not config.rollups:
+        return None
+    if config.level != "campaign" or config.time_increment != 1:
+        print("\n❌ Rollups cần level=campaign và time_increment=1")
+        return False
+    for kind, rollup_config in list(config.rollups.items()):
+        if kind not in ROLLUP_KINDS:
+            print(f"\n❌ Rollup '{kind}' không hợp lệ ({', '.join(ROLLUP_KINDS)})")
+            return False
+        if kind == "campaign" and config.date_mode == "watermark":
+            # Chỉ lấy lại vài ngày gần đây -> không đủ để ra tổng cả khoảng
+            print("⚠️ Rollup campaign cần DATE_MODE=static - bỏ qua")
+            del config.rollups[kind]
+            continue
+        skipped = unsupported_fields(rollup_config.field_mappings)
+        for field in skipped:
+            print(f"⚠️ Rollup {kind}: '{field}' không tính được từ số campaign × ngày - bỏ qua")
+        rollup_config.field_mappings = {
+            fb: notion for fb, notion in rollup_config.field_mappings.items() if fb not in skipped
+        }
+        check_key_columns(rollup_config, f"Rollup {kind}")
+        rollup_config.facebook_fields = list(rollup_config.field_mappings)
+        rollup_config.account_ids = list(config.account_ids)
+        rollup_config.date_mode = config.date_mode
+        rollup_config.start_date, rollup_config.end_date = config.start_date, config.end_date
+        rollup_config.insights_cache = False
+        for field in required_fields(rollup_config.facebook_fields):
+            if field not in config.facebook_fields:
+                config.facebook_fields.append(field)
+    return InsightsRollup(config.facebook_fields) if config.rollups else None
+
+
+def run_rollups(
+    config: SyncConfig, rollup: InsightsRollup, state: Optional[SyncStateStore], date_ranges: DateRanges, failed: Set[str]
+) -> Dict[str, int]:
+    """Ghi các bảng tổng hợp từ số đã cộng dồn (không gọi Graph); stats dạng rollup_<kind>_<key>"""
+    stats = {}
+    for kind, rollup_config in config.rollups.items():
+        rollup_stats = run_pipeline(
+            rollup_config, state=state, report=False,
+            source=rollup.source(kind, failed), date_ranges=date_ranges,
+        )
+        for key in ("fetched", "created", "updated", "unchanged", "archived", "failed"):
+            stats[f"rollup_{kind}_{key}"] = (rollup_stats or {}).get(key, 0)
+    return stats
+
+
+def print_summary(config: SyncConfig, stats: Dict, date_ranges: DateRanges, failed: Set[str]):
+    print("\n" + "=" * 70)
+    print("✅ SYNC HOÀN TẤT!")
+    print("=" * 70)
+    print(f"📊 Lấy: {stats['fetched']} records từ {len(config.account_ids)} accounts")
+    if config.date_mode == "watermark":
+        for account_id, (since, until) in date_ranges.items():
+            print(f"📅 {account_id}: {since} → {until}")
+    else:
+        print(f"📅 Date Range: {config.start_date} → {config.end_date}")
+    if failed:
+        print(f"⚠️  Account lỗi fetch: {', '.join(sorted(failed))}")
+    if "cache_hit_days" in stats:
+        print(f"💾 Cache Insights: {stats['cache_hit_days']} ngày từ cache, {stats['cache_miss_days']} ngày hỏi Graph")
+    print(f"✨ Tạo mới: {stats['created']}")
+    print(f"🔄 Cập nhật: {stats['updated']}")
+    print(f"⏭️  Không đổi: {stats['unchanged']}")
+    print(f"🗑️  Archive: {stats['archived']}")
+    print(f"❌ Thất bại: {stats['failed']}")
+    print(f"📊 Tổng ghi: {stats['created'] + stats['updated'] + stats['archived']}")
+    print("=" * 70 + "\n")
@@ -0,0 +1,238 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PROFILE_DIR = os.getenv("PROFILE_DIR", ".sync_state/profile")
+# Khung stack giữ lại cho mỗi allocation (tracemalloc)
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+# Stage ngoài cùng: mọi thứ không nằm trong stage nào (khởi tạo, in summary...)
+ROOT_STAGE = "other"
+
+
+class Profiler:
+    """--profile: cProfile theo stage, tracemalloc và trace từng request (Chrome trace format)
+
+    cProfile chỉ đo thread đã bật nó và mỗi thread chỉ có 1 profiler hoạt động,
+    nên mỗi (stage, thread) có 1 cProfile.Profile riêng; vào stage con thì tạm tắt
+    stage cha của thread đó. Khi dump, các Profile cùng stage được gộp bằng pstats.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._events: List[Dict] = []
+        self._threads: Dict[int, str] = {}
+        self._dumped = False
+
+    # ---------- cProfile theo stage ----------
+
+    def _profile(self, name: str) -> cProfile.Profile:
+        key = (name, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+            return profile
+
+    def _stack(self) -> List[cProfile.Profile]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profile khối code vào stage name (và ghi 1 span vào trace)"""
+        stack = self._stack()
+        profile = self._profile(name)
+        if stack:
+            stack[-1].disable()
+        stack.append(profile)
+        _enable(profile)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            profile.disable()
+            stack.pop()
+            if stack:
+                _enable(stack[-1])
+            self.add_event(name, "stage", start, end - start)
+
+    # ---------- Trace ----------
+
+    def add_event(self, name: str, category: str, start: float, duration: float, args: Optional[Dict] = None):
+        """1 span (perf_counter start, duration giây) của thread hiện tại"""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    def on_response(self, api: Optional[str], response):
+        """Response hook: request kết thúc lúc này, kéo dài response.elapsed"""
+        from module.metrics import endpoint_name
+
+        duration = response.elapsed.total_seconds()
+        request = response.request
+        self.add_event(
+            endpoint_name(request.method, request.url),
+            api or "http",
+            time.perf_counter() - duration,
+            duration,
+            {"status": response.status_code},
+        )
+
+    # ---------- Ghi kết quả ----------
+
+    def dump(self):
+        """Ghi <stage>.pstats, summary.txt, tracemalloc.txt và trace.json vào directory"""
+        if self._dumped:
+            return
+        self._dumped = True
+        for profile in reversed(self._stack()):
+            profile.disable()
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Chụp bộ nhớ trước khi xử lý pstats để không tính allocation của chính profiler
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._write_tracemalloc(snapshot, current, peak)
+
+        with self._lock:
+            profiles = dict(self._profiles)
+            events = list(self._events)
+            threads = dict(self._threads)
+
+        by_stage: Dict[str, pstats.Stats] = {}
+        for (name, _), profile in profiles.items():
+            try:
+                stats = pstats.Stats(profile)
+            except TypeError:
+                # Profile chưa thu được gì (stage rỗng)
+                continue
+            if name in by_stage:
+                by_stage[name].add(stats)
+            else:
+                by_stage[name] = stats
+
+        summary = io.StringIO()
+        for name, stats in sorted(by_stage.items(), key=lambda item: -item[1].total_tt):
+            stats.dump_stats(os.path.join(self.directory, f"{name}.pstats"))
+            summary.write(f"{'=' * 30} {name}: {stats.total_tt:.3f}s CPU trong stage {'=' * 30}\n")
+            stats.stream = summary
+            stats.sort_stats("cumulative").print_stats(25)
+        with open(os.path.join(self.directory, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        with open(os.path.join(self.directory, "trace.json"), "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+        print(f"🔬 Profile: {self.directory} (summary.txt, *.pstats, tracemalloc.txt, trace.json)")
+
+    def _write_tracemalloc(self, snapshot, current: int, peak: int):
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        with open(os.path.join(self.directory, "tracemalloc.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Hiện tại: {current / 1024 / 1024:.1f} MB, đỉnh: {peak / 1024 / 1024:.1f} MB\n\n")
+            f.write("Top 30 theo dòng code:\n")
+            for stat in snapshot.statistics("lineno")[:30]:
+                f.write(f"  {stat}\n")
+            f.write("\nTop 10 theo traceback:\n")
+            for stat in snapshot.statistics("traceback")[:10]:
+                f.write(f"\n{stat.size / 1024:.1f} KiB, {stat.count} block\n")
+                for line in stat.traceback.format():
+                    f.write(f"  {line}\n")
+
+
+def _enable(profile: cProfile.Profile):
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+: cả process chỉ 1 profiler hoạt động -> thread này chỉ còn trace, không có cProfile
+        pass
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    """Profiler đang bật (None nếu không chạy với --profile)"""
+    return _profiler
+
+
+def profile_stage(name: str):
+    """with profile_stage("fetch"): ... - không làm gì nếu không bật --profile"""
+    return _profiler.stage(name) if _profiler is not None else nullcontext()
+
+
+def enable_profiling(directory: Optional[str] = None) -> Profiler:
+    """Bật profile cho cả process; kết quả được ghi khi process thoát (kể cả exit()/lỗi)"""
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+
+    from module.http_transport import add_response_hook
+
+    if not directory:
+        run = os.path.splitext(os.path.basename(sys.argv[0] or ""))[0] or "run"
+        directory = os.path.join(DEFAULT_PROFILE_DIR, f"{run}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    _profiler = Profiler(directory)
+    add_response_hook(_profiler.on_response)
+
+    # Thread chính: phần không thuộc stage nào
+    root = _profiler.stage(ROOT_STAGE)
+    root.__enter__()
+    atexit.register(_profiler.dump)
+    return _profiler
+
+
+def enable_profiling_from_args(args) -> Optional[Profiler]:
+    """Bật profile nếu entry point được chạy với --profile"""
+    if getattr(args, "profile", None) is None:
+        return None
+    return enable_profiling(args.profile or None)
+
+
+def add_profile_argument(parser):
+    """Thêm --profile [DIR] vào argparse của entry point"""
+    parser.add_argument(
+        '--profile', nargs='?', const='', default=None, metavar='DIR',
+        help=f"Profile run: cProfile theo stage, tracemalloc, Chrome trace (mặc định {DEFAULT_PROFILE_DIR}/<script>-<giờ>)",
+    )
+    return parser
@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from module.rate_limiter import TokenBucket
+
+load_dotenv()
+
+# Notion: trung bình ~3 request/giây mỗi integration, cho phép burst ngắn
+NOTION_RATE = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+NOTION_BURST = float(os.getenv("NOTION_RATE_BURST", "5"))
+# Graph API không có giới hạn cố định theo giây -> mặc định chỉ điều tốc theo header usage
+FACEBOOK_RATE = float(os.getenv("FACEBOOK_RATE_LIMIT", "0"))
+# Ngưỡng % usage (X-Business-Use-Case-Usage / X-Ad-Account-Usage / X-App-Usage)
+FACEBOOK_USAGE_SLOWDOWN = float(os.getenv("FACEBOOK_USAGE_SLOWDOWN", "75"))
+FACEBOOK_USAGE_PAUSE = float(os.getenv("FACEBOOK_USAGE_PAUSE", "90"))
+
+DEFAULT_PAUSE_SECONDS = 60.0
+# Mã lỗi throttling của Graph API (trả về 400/403 kèm error.code)
+GRAPH_THROTTLE_CODES = {4, 17, 32, 613, 80000, 80003, 80004, 80014}
+
+_ACCOUNT_RE = re.compile(r"/act_(\d+)")
+
+
+class ApiBudget:
+    """Ngân sách request của 1 API hoặc 1 ad account: token bucket + tạm dừng khi bị throttle"""
+
+    def __init__(self, name: str, rate: float = 0, burst: float = 0):
+        self.name = name
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, burst or rate) if rate > 0 else None
+        self.paused_until = 0.0
+        self.usage_pct = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Chờ hết thời gian tạm dừng rồi lấy 1 token"""
+        while True:
+            with self._lock:
+                delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            time.sleep(delay)
+        if self.bucket is not None:
+            self.bucket.acquire()
+        with self._lock:
+            self.requests += 1
+
+    def hold(self, seconds: float):
+        """Tạm giữ request vì usage cao (chưa bị throttle): không đếm throttled, không giảm rate"""
+        with self._lock:
+            self.held += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def pause(self, seconds: float):
+        """Bị throttle thật (429 / mã lỗi throttle Graph): dừng mọi worker của ngân sách này và giảm tốc độ"""
+        with self._lock:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            if self.bucket is not None:
+                # Giảm nhân khi bị throttle
+                self.bucket.set_rate(max(self.max_rate * 0.1, self.bucket.rate * 0.5))
+
+    def paused_for(self) -> float:
+        """Số giây còn tạm dừng (0 nếu đang được gửi)"""
+        with self._lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def recover(self):
+        """Tăng dần về tốc độ tối đa sau mỗi request thành công"""
+        if self.bucket is not None and self.bucket.rate < self.max_rate:
+            with self._lock:
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate * 0.05))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "rate": round(self.bucket.rate, 3) if self.bucket is not None else None,
+                "max_rate": self.max_rate or None,
+                "usage_pct": self.usage_pct,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "held": self.held,
+            }
+
+
+class RateGovernor:
+    """Điều tốc chung cho mọi request: Notion (429 + Retry-After) và Graph API (header usage)
+
+    Mọi HttpTransport gọi before_request/after_response, nên tất cả worker thread
+    của mọi script cùng tạm dừng/tiếp tục theo cùng một ngân sách.
+    """
+
+    def __init__(self):
+        self._budgets: Dict[str, ApiBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, key: str) -> ApiBudget:
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                if key == "notion":
+                    budget = ApiBudget(key, NOTION_RATE, NOTION_BURST)
+                elif key == "graph":
+                    budget = ApiBudget(key, FACEBOOK_RATE)
+                else:
+                    budget = ApiBudget(key)
+                self._budgets[key] = budget
+            return budget
+
+    def configure(self, key: str, rate: float, burst: float = 0) -> ApiBudget:
+        """Đặt lại tốc độ của 1 ngân sách (gọi trước khi chạy job, vd từ manifest orchestrator)"""
+        with self._lock:
+            budget = ApiBudget(key, rate, burst)
+            self._budgets[key] = budget
+            return budget
+
+    def _budgets_for(self, api: str, url: str):
+        budgets = [self.budget(api)]
+        if api == "graph":
+            match = _ACCOUNT_RE.search(url)
+            if match:
+                budgets.append(self.budget(f"graph:act_{match.group(1)}"))
+        return budgets
+
+    def account_budget(self, api: str, url: str) -> Optional[ApiBudget]:
+        """Ngân sách ad account (act_<id>) của URL Graph; None nếu URL không thuộc account nào"""
+        budgets = self._budgets_for(api, url)
+        return budgets[1] if len(budgets) > 1 else None
+
+    def before_request(self, api: str, url: str):
+        for budget in self._budgets_for(api, url):
+            budget.wait()
+
+    def after_response(self, api: str, url: str, response):
+        budgets = self._budgets_for(api, url)
+        if api == "notion":
+            self._after_notion(budgets[0], response)
+        elif api == "graph":
+            self._after_graph(budgets, response)
+
+    def is_throttled(self, api: str, response) -> bool:
+        """Response là tín hiệu bị giới hạn tốc độ (nên chờ rồi gửi lại)"""
+        if response.status_code == 429:
+            return True
+        return api == "graph" and _graph_error_code(response) in GRAPH_THROTTLE_CODES
+
+    def utilisation(self) -> Dict[str, Dict]:
+        """Trạng thái hiện tại của từng ngân sách (rate, % usage, thời gian còn tạm dừng...)"""
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {key: budget.snapshot() for key, budget in budgets.items()}
+
+    # ---------- Notion ----------
+
+    def _after_notion(self, budget: ApiBudget, response):
+        if response.status_code == 429:
+            budget.pause(_retry_after(response, 1.0))
+        else:
+            budget.recover()
+
+    # ---------- Graph API ----------
+
+    def _after_graph(self, budgets, response):
+        api_budget = budgets[0]
+        account_budget = budgets[1] if len(budgets) > 1 else api_budget
+
+        app_pct = _max_pct(_parse_json_header(response, "X-App-Usage"))
+        api_budget.usage_pct = app_pct
+
+        account_usage = _parse_json_header(response, "X-Ad-Account-Usage")
+        business_usage = _parse_json_header(response, "X-Business-Use-Case-Usage")
+        account_pct = float(account_usage.get("acc_id_util_pct", 0) or 0)
+        regain_seconds = float(account_usage.get("reset_time_duration", 0) or 0)
+        for entries in business_usage.values():
+            for entry in entries if isinstance(entries, list) else []:
+                account_pct = max(account_pct, _max_pct(entry))
+                regain_seconds = max(regain_seconds, float(entry.get("estimated_time_to_regain_access", 0) or 0) * 60)
+        account_budget.usage_pct = account_pct
+
+        if response.status_code == 429 or _graph_error_code(response) in GRAPH_THROTTLE_CODES:
+            account_budget.pause(regain_seconds or _retry_after(response, DEFAULT_PAUSE_SECONDS))
+            return
+
+        # Usage cao nhưng request vẫn thành công: chỉ giữ lại (hold), không tính là throttle
+        # và không giảm rate - pause() chỉ dành cho 429/mã lỗi throttle ở trên
+        for budget, pct in ((api_budget, app_pct), (account_budget, account_pct)):
+            if pct >= FACEBOOK_USAGE_PAUSE:
+                budget.hold(regain_seconds or DEFAULT_PAUSE_SECONDS)
+            elif pct >= FACEBOOK_USAGE_SLOWDOWN:
+                # Gần ngưỡng: giãn request ra thay vì chờ bị khóa
+                budget.hold(1.0 + (pct - FACEBOOK_USAGE_SLOWDOWN) / 5)
+
+
+def _retry_after(response, default: float) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_json_header(response, name: str) -> Dict:
+    raw = response.headers.get(name)
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+        return value if isinstance(value, dict) else {}
+    except ValueError:
+        return {}
+
+
+def _max_pct(usage: Dict) -> float:
+    values = [usage.get(key) for key in ("call_count", "total_cputime", "total_time")]
+    return float(max((value for value in values if isinstance(value, (int, float))), default=0))
+
+
+def _graph_error_code(response) -> Optional[int]:
+    if response.status_code < 400:
+        return None
+    try:
+        return response.json().get("error", {}).get("code")
+    except ValueError:
+        return None
+
+
+_governor = RateGovernor()
+
+
+def get_governor() -> RateGovernor:
+    """Governor dùng chung cho toàn bộ process"""
+    return _governor
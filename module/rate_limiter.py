@@ -0,0 +1,42 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket giới hạn số request/giây, an toàn khi dùng từ nhiều thread"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate phải > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def set_rate(self, rate: float):
+        """Đổi tốc độ nạp token (dùng cho điều tốc thích nghi)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(float(rate), 1e-3)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Chờ tới khi đủ token, trả về số giây đã chờ"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
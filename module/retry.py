@@ -0,0 +1,68 @@
+import os
+import random
+from typing import Optional
+
+import requests
+from dotenv import load_dotenv
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+load_dotenv()
+
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+BASE_DELAY = float(os.getenv("HTTP_RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def failed_to_connect(error: Exception) -> bool:
+    """Lỗi lúc mở kết nối: request chắc chắn chưa được gửi đi
+
+    Mất kết nối sau khi đã gửi (RemoteDisconnected, reset khi đọc...) cũng là
+    ConnectionError nhưng server có thể đã xử lý -> không tính ở đây.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # requests bọc MaxRetryError của urllib3, lỗi thật nằm ở .reason
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class RetryPolicy:
+    """Retry lỗi tạm thời với exponential backoff + full jitter"""
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+    ):
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = MAX_DELAY if max_delay is None else max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Thời gian chờ trước lần thử thứ attempt+1 (attempt bắt đầu từ 0)"""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def should_retry_response(
+        self, response: requests.Response, throttled: bool = False, idempotent: bool = True
+    ) -> bool:
+        # 429/throttle: server từ chối, không xử lý -> gửi lại được kể cả tạo page.
+        # 5xx: server có thể đã tạo page rồi mới lỗi -> chỉ retry request idempotent
+        if throttled or response.status_code == 429:
+            return True
+        return idempotent and response.status_code in RETRYABLE_STATUS
+
+    def should_retry_error(self, error: Exception, idempotent: bool = True) -> bool:
+        # Không mở được kết nối -> request chưa tới server, luôn retry được
+        if failed_to_connect(error):
+            return True
+        # Mất kết nối/timeout sau khi đã gửi: server có thể đã xử lý -> chỉ retry request idempotent
+        if isinstance(error, (
+            requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError
+        )):
+            return idempotent
+        return False
@@ -0,0 +1,139 @@
+import threading
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+# Field cộng được qua campaign/ngày
+ADDITIVE_FIELDS = ("spend", "impressions", "clicks", "inline_link_clicks")
+# Field tỉ lệ: tính lại từ tổng (tử, mẫu, hệ số) - không cộng/trung bình tỉ lệ của từng dòng
+RATIO_FIELDS = {
+    "ctr": ("clicks", "impressions", 100),
+    "cpc": ("spend", "clicks", 1),
+    "cpm": ("spend", "impressions", 1000),
+}
+# Field mô tả lấy nguyên từ record
+_ID_FIELDS = ("account_id", "account_name", "campaign_id", "campaign_name")
+_RATIO_PLACES = Decimal("0.000001")
+
+ROLLUP_KINDS = ("daily", "campaign")
+
+
+def derivable(field: str) -> bool:
+    return field in ADDITIVE_FIELDS or field in RATIO_FIELDS or field in _ID_FIELDS or field in ("date_start", "date_stop")
+
+
+def unsupported_fields(fields: Iterable[str]) -> List[str]:
+    """Field không tính được từ số campaign × ngày (vd reach, frequency - không cộng được)"""
+    return [field for field in fields if not derivable(field)]
+
+
+def required_fields(fields: Iterable[str]) -> List[str]:
+    """Field cần fetch ở mức campaign × ngày để tính được các field này"""
+    needed = []
+    for field in fields:
+        for name in RATIO_FIELDS.get(field, (field,))[:2]:
+            if name not in needed and (name in ADDITIVE_FIELDS or name in _ID_FIELDS):
+                needed.append(name)
+    return needed
+
+
+def _number(value) -> Decimal:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return Decimal(0)
+
+
+class InsightsRollup:
+    """Cộng dồn record level=campaign, time_increment=1 khi stream đi qua
+
+    Từ cùng 1 lần fetch ra 2 bảng tổng hợp, không thêm request Graph:
+    - daily: (account, ngày) - như level=account, time_increment=1
+    - campaign: tổng cả khoảng ngày của từng campaign - như level=campaign không time_increment
+    Cộng bằng Decimal nên kết quả không phụ thuộc thứ tự record từ các thread fetch
+    (fingerprint ổn định, không update thừa). Bộ nhớ theo số account×ngày + số campaign.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.additive = [field for field in ADDITIVE_FIELDS if field in fields]
+        self.ratios = {
+            field: spec for field, spec in RATIO_FIELDS.items() if spec[0] in self.additive and spec[1] in self.additive
+        }
+        self.account_days: Dict[Tuple[str, str], Dict] = {}
+        self.campaigns: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _add_to(self, totals: Dict, record: Dict):
+        for field in self.additive:
+            value = record.get(field)
+            if value is not None:
+                totals[field] = totals.get(field, Decimal(0)) + _number(value)
+
+    def add(self, record: Dict):
+        account_id = str(record.get("account_id", ""))
+        day = record.get("date_start", "")
+        campaign_id = str(record.get("campaign_id", ""))
+        with self._lock:
+            daily = self.account_days.get((account_id, day))
+            if daily is None:
+                daily = self.account_days[(account_id, day)] = {
+                    "account_id": account_id, "account_name": record.get("account_name"),
+                    "date_start": day, "date_stop": record.get("date_stop", day),
+                }
+            self._add_to(daily, record)
+            if campaign_id:
+                campaign = self.campaigns.get(campaign_id)
+                if campaign is None:
+                    campaign = self.campaigns[campaign_id] = {
+                        field: record.get(field) for field in _ID_FIELDS
+                    }
+                self._add_to(campaign, record)
+
+    def tap(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Trả nguyên record, cộng dồn trên đường đi"""
+        for record in records:
+            self.add(record)
+            yield record
+
+    def _finish(self, totals: Dict) -> Dict:
+        """Tổng Decimal -> record giống Graph (số dạng chuỗi), tỉ lệ tính lại từ tổng"""
+        record = {field: value for field, value in totals.items() if value is not None}
+        for field, (numerator, denominator, scale) in self.ratios.items():
+            top = totals.get(numerator, Decimal(0))
+            bottom = totals.get(denominator, Decimal(0))
+            if bottom:
+                record[field] = str((top * scale / bottom).quantize(_RATIO_PLACES))
+        for field in self.additive:
+            if field in record:
+                record[field] = str(record[field])
+        return record
+
+    def daily_records(self, exclude: Set[str] = frozenset()) -> Iterator[Dict]:
+        for (account_id, _), totals in sorted(self.account_days.items()):
+            if account_id not in exclude:
+                yield self._finish(totals)
+
+    def campaign_records(self, date_ranges: Dict[str, Tuple[str, str]], exclude: Set[str] = frozenset()) -> Iterator[Dict]:
+        """Tổng mỗi campaign trên khoảng ngày đã lấy của account (date_start/date_stop như Graph)"""
+        for campaign_id in sorted(self.campaigns):
+            totals = self.campaigns[campaign_id]
+            account_id = str(totals.get("account_id", ""))
+            if account_id in exclude:
+                continue
+            since, until = date_ranges.get(account_id, ("", ""))
+            yield dict(self._finish(totals), date_start=since, date_stop=until)
+
+    def source(self, kind: str, failed: Set[str]) -> Callable:
+        """Nguồn record cho pipeline của bảng tổng hợp (cùng chữ ký insights_source)
+
+        Account lỗi fetch ở lần lấy campaign × ngày bị bỏ (số tổng của nó không đủ)
+        và được đánh dấu lỗi luôn ở job tổng hợp để không bị archive.
+        """
+        def records(config, date_ranges, rollup_failed: Set[str], cache=None) -> Iterator[Dict]:
+            rollup_failed.update(failed)
+            if kind == "daily":
+                print(f"   📊 Tổng hợp cục bộ: {len(self.account_days)} dòng account × ngày")
+                return self.daily_records(failed)
+            print(f"   📊 Tổng hợp cục bộ: {len(self.campaigns)} campaign")
+            return self.campaign_records(date_ranges, failed)
+        return records
+
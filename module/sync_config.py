@@ -0,0 +1,122 @@
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (tên property Notion, field Facebook, kiểu) - xem notion_properties.PropertyBuilder
+FixedProperty = Tuple[str, str, str]
+
+
+def env_list(name: str, default: str = "") -> List[str]:
+    """Biến môi trường dạng "a,b,c" -> ["a", "b", "c"]"""
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, "true" if default else "false").strip().lower() in ("1", "true", "yes")
+
+
+def parse_field_mappings(raw: str, defaults: Dict[str, str]) -> Dict[str, str]:
+    """"facebook_field|Notion Field,..." -> {facebook_field: Notion Field}, rỗng thì dùng defaults"""
+    mappings = {}
+    for pair in raw.split(","):
+        if "|" in pair:
+            fb_field, notion_field = pair.strip().split("|")
+            mappings[fb_field.strip()] = notion_field.strip()
+    return mappings or dict(defaults)
+
+
+@dataclass
+class SyncConfig:
+    """Cấu hình 1 pipeline Facebook Insights → Notion (mỗi script sync là 1 cấu hình)"""
+
+    title: str
+    database_id: str
+    key_properties: List[str]
+    level: str
+    facebook_fields: List[str]
+    field_mappings: Dict[str, str]
+    account_ids: List[str]
+    access_token: Optional[str]
+    notion_api_key: Optional[str]
+    start_date: str
+    end_date: str
+    # Field Facebook ghi thành title, và các property luôn có (vd Account ID/Date của daily)
+    title_field: Optional[str] = None
+    fixed_properties: List[FixedProperty] = field(default_factory=list)
+    # 1 -> breakdown theo ngày; None -> tổng cả khoảng ngày
+    time_increment: Optional[int] = None
+    # upsert | replace (xóa hết rồi tạo) | create (chỉ tạo)
+    sync_mode: str = "upsert"
+    # Upsert: archive dòng không còn trong dữ liệu Facebook
+    archive_stale: bool = True
+    # static (start_date → end_date) | watermark (watermark - lookback → hôm nay)
+    date_mode: str = "static"
+    lookback_days: int = 7
+    window_days: int = 7
+    # Index cold path: chỉ lấy cột khóa, query song song theo property account (nếu có)
+    index_projection: bool = False
+    index_partition_property: Optional[str] = None
+    # Database dùng chung với job khác: chỉ archive dòng của account_ids của mình
+    archive_own_accounts_only: bool = False
+    # Số thread ghi Notion (None -> NOTION_WRITE_WORKERS)
+    write_workers: Optional[int] = None
+    # Cache response Insights trên đĩa (module/insights_cache.py)
+    insights_cache: bool = True
+    # >1: gộp request insights thành Graph batch (tối đa 50); None -> FACEBOOK_BATCH_SIZE
+    graph_batch_size: Optional[int] = None
+    # Chỉ cho level=campaign + time_increment=1: bảng tổng hợp tính cục bộ từ cùng lần fetch
+    # ("daily" -> account × ngày, "campaign" -> tổng campaign cả khoảng), không gọi thêm Graph
+    rollups: Dict[str, "SyncConfig"] = field(default_factory=dict)
+    label: Callable[[Dict], str] = lambda record: str(record.get("account_id", ""))
+
+    @classmethod
+    def from_env(
+        cls,
+        title: str,
+        database_env: str,
+        key_properties: List[str],
+        level: str,
+        default_fields: str,
+        default_mappings: Dict[str, str],
+        **overrides,
+    ) -> "SyncConfig":
+        """Đọc phần cấu hình chung từ biến môi trường; overrides ghi đè/bổ sung các trường còn lại"""
+        values = dict(
+            title=title,
+            database_id=os.getenv(database_env, ""),
+            key_properties=key_properties,
+            level=level,
+            facebook_fields=env_list("FACEBOOK_FIELDS", default_fields),
+            field_mappings=parse_field_mappings(os.getenv("NOTION_FIELD_MAPPINGS", ""), default_mappings),
+            account_ids=env_list("FACEBOOK_AD_ACCOUNT_IDS"),
+            access_token=os.getenv("FACEBOOK_ACCESS_TOKEN"),
+            notion_api_key=os.getenv("NOTION_API_KEY"),
+            start_date=os.getenv("START_DATE", "2025-10-01"),
+            end_date=os.getenv("END_DATE", "2025-10-29"),
+            sync_mode=os.getenv("SYNC_MODE", "upsert").strip().lower(),
+            date_mode=os.getenv("DATE_MODE", "static").strip().lower(),
+            lookback_days=int(os.getenv("ATTRIBUTION_LOOKBACK_DAYS", "7")),
+            window_days=int(os.getenv("FETCH_WINDOW_DAYS", "7")),
+            insights_cache=env_flag("INSIGHTS_CACHE", True),
+        )
+        values.update(overrides)
+        config = cls(**values)
+
+        # Watermark chỉ lấy vài ngày gần nhất -> phải upsert, không được xóa/tạo lại
+        if config.date_mode == "watermark" and config.sync_mode != "upsert":
+            print(f"⚠️ DATE_MODE=watermark cần SYNC_MODE=upsert (đang là {config.sync_mode}) - chuyển sang upsert")
+            config.sync_mode = "upsert"
+        return config
+
+    def validate(self) -> List[str]:
+        """Danh sách lỗi cấu hình (rỗng nếu hợp lệ)"""
+        errors = []
+        if not self.account_ids:
+            errors.append("Không có Ad Account IDs (FACEBOOK_AD_ACCOUNT_IDS)!")
+        if not self.database_id:
+            errors.append("Không có Notion database ID!")
+        if not all([self.access_token, self.notion_api_key]):
+            errors.append("Credentials không đầy đủ trong .env!")
+        if not self.facebook_fields:
+            errors.append("Không có Facebook Fields (FACEBOOK_FIELDS)!")
+        return errors
@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_STATE_PATH = os.getenv("SYNC_STATE_PATH", ".sync_state/sync_state.db")
+
+# Cột thêm sau phiên bản đầu -> tự ALTER TABLE cho file state cũ
+_EXTRA_COLUMNS = {"page_id": "TEXT", "values_json": "TEXT"}
+# Số dòng mỗi lần đọc/ghi theo lô (giữ bộ nhớ và thời gian giữ khóa nhỏ)
+BATCH_SIZE = 500
+# Scope tạm khi nạp lại index, đổi tên thành scope thật trong 1 transaction
+_STAGING_SUFFIX = "#rebuild"
+
+
+class SyncStateStore:
+    """Trạng thái sync cục bộ (SQLite): source key -> Notion page_id, giá trị và fingerprint lần ghi cuối
+
+    scope thường là database_id, source_key là khóa nguồn (campaign_id, "account|date"...).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_STATE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Writer gọi callback từ nhiều thread -> dùng chung 1 connection có khóa
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rows (
+                    scope TEXT NOT NULL,
+                    source_key TEXT NOT NULL,
+                    page_id TEXT,
+                    fingerprint TEXT,
+                    values_json TEXT,
+                    synced_at TEXT,
+                    PRIMARY KEY (scope, source_key)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    scope TEXT NOT NULL,
+                    account_id TEXT NOT NULL,
+                    synced_until TEXT NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (scope, account_id)
+                )
+                """
+            )
+            # Khóa đã gặp trong run hiện tại (chỉ sống trong connection này)
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS seen (scope TEXT NOT NULL, source_key TEXT NOT NULL, PRIMARY KEY (scope, source_key))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(rows)")}
+            for name, column_type in _EXTRA_COLUMNS.items():
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE rows ADD COLUMN {name} {column_type}")
+
+    # ---------- Đọc ----------
+
+    def count(self, scope: str, with_page_id: bool = False) -> int:
+        query = "SELECT COUNT(*) FROM rows WHERE scope = ?" + (" AND page_id IS NOT NULL" if with_page_id else "")
+        with self._lock:
+            cursor = self._conn.execute(query, (scope,))
+            return cursor.fetchone()[0]
+
+    def lookup(self, scope: str, source_keys: Sequence[str]) -> Dict[str, Dict]:
+        """source_key -> {page_id, fingerprint, values, synced_at} cho các source_key đã có page_id (đọc theo lô)"""
+        found = {}
+        for start in range(0, len(source_keys), BATCH_SIZE):
+            batch = list(source_keys[start:start + BATCH_SIZE])
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                cursor = self._conn.execute(
+                    f"""
+                    SELECT source_key, page_id, fingerprint, values_json, synced_at FROM rows
+                    WHERE scope = ? AND page_id IS NOT NULL AND source_key IN ({placeholders})
+                    """,
+                    [scope] + batch,
+                )
+                rows = cursor.fetchall()
+            for source_key, page_id, fingerprint, values_json, synced_at in rows:
+                found[source_key] = {
+                    "page_id": page_id,
+                    "fingerprint": fingerprint,
+                    "values": json.loads(values_json) if values_json else {},
+                    "synced_at": synced_at,
+                }
+        return found
+
+    # ---------- Khóa đã gặp trong run ----------
+
+    def clear_seen(self, scope: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM seen WHERE scope = ?", (scope,))
+
+    def mark_seen(self, scope: str, source_keys: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (scope, source_key) VALUES (?, ?)",
+                ((scope, source_key) for source_key in source_keys),
+            )
+
+    def iter_unseen(self, scope: str) -> Iterator[Tuple[str, str]]:
+        """(source_key, page_id) của dòng trong scope chưa mark_seen, đọc theo lô
+
+        Phân trang theo source_key nên vẫn đúng khi dòng bị xóa (archive) trong lúc duyệt.
+        """
+        last = ""
+        while True:
+            with self._lock:
+                cursor = self._conn.execute(
+                    """
+                    SELECT source_key, page_id FROM rows
+                    WHERE scope = ? AND page_id IS NOT NULL AND source_key > ?
+                      AND source_key NOT IN (SELECT source_key FROM seen WHERE scope = ?)
+                    ORDER BY source_key LIMIT ?
+                    """,
+                    (scope, last, scope, BATCH_SIZE),
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    # ---------- Ghi ----------
+
+    def record(
+        self,
+        scope: str,
+        source_key: str,
+        page_id: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+        values: Optional[Dict] = None,
+    ):
+        """Ghi nhận 1 dòng vừa sync thành công (giữ page_id cũ nếu không truyền)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO rows (scope, source_key, page_id, fingerprint, values_json, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(scope, source_key) DO UPDATE SET
+                    page_id = COALESCE(excluded.page_id, rows.page_id),
+                    fingerprint = excluded.fingerprint,
+                    values_json = excluded.values_json,
+                    synced_at = excluded.synced_at
+                """,
+                (
+                    scope,
+                    source_key,
+                    page_id,
+                    fingerprint,
+                    json.dumps(values, ensure_ascii=False, default=str) if values is not None else None,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+    def apply_write(self, action: str, meta: Dict, page: Optional[Dict] = None):
+        """Cập nhật state sau 1 lệnh ghi Notion thành công
+
+        meta: {scope, source_key, values?, fingerprint?} do nơi gửi lệnh ghi đính kèm.
+        """
+        scope = meta.get("scope")
+        source_key = meta.get("source_key")
+        if not scope or source_key is None:
+            return
+        if action == "archived":
+            self.delete(scope, source_key)
+        else:
+            self.record(
+                scope,
+                source_key,
+                page_id=(page or {}).get("id"),
+                fingerprint=meta.get("fingerprint"),
+                values=meta.get("values"),
+            )
+
+    def delete(self, scope: str, source_key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rows WHERE scope = ? AND source_key = ?", (scope, source_key))
+
+    def replace_scope(
+        self,
+        scope: str,
+        rows: Iterable[Tuple[str, str, Dict]],
+        on_duplicate: Optional[Callable[[str, str], None]] = None,
+    ) -> int:
+        """Xóa toàn bộ scope rồi nạp lại (source_key, page_id, values) - dùng khi sửa lệch với Notion
+
+        rows có thể là stream (vd page đang query từ Notion): nạp theo lô vào scope tạm,
+        cuối cùng mới thay scope thật trong 1 transaction, nên lỗi giữa chừng không làm hỏng state.
+        on_duplicate(source_key, page_id): source_key đã có -> giữ dòng đầu, báo page trùng;
+        không truyền thì dòng sau ghi đè.
+        """
+        staging = scope + _STAGING_SUFFIX
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rows WHERE scope = ?", (staging,))
+
+        count = 0
+        batch: List[Tuple[str, str, Dict]] = []
+
+        def flush():
+            nonlocal count
+            with self._lock, self._conn:
+                for source_key, page_id, values in batch:
+                    values_json = json.dumps(values, ensure_ascii=False, default=str)
+                    verb = "INSERT" if on_duplicate else "INSERT OR REPLACE"
+                    try:
+                        self._conn.execute(
+                            f"""
+                            {verb} INTO rows (scope, source_key, page_id, fingerprint, values_json, synced_at)
+                            VALUES (?, ?, ?, NULL, ?, ?)
+                            """,
+                            (staging, source_key, page_id, values_json, now),
+                        )
+                        count += 1
+                    except sqlite3.IntegrityError:
+                        on_duplicate(source_key, page_id)
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rows WHERE scope = ?", (scope,))
+            self._conn.execute("UPDATE rows SET scope = ? WHERE scope = ?", (scope, staging))
+        return count
+
+    # ---------- Watermark ----------
+
+    def get_watermarks(self, scope: str) -> Dict[str, str]:
+        """account_id -> ngày cuối cùng đã sync thành công (YYYY-MM-DD)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT account_id, synced_until FROM watermarks WHERE scope = ?", (scope,)
+            )
+            return dict(cursor.fetchall())
+
+    def set_watermark(self, scope: str, account_id: str, synced_until: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO watermarks (scope, account_id, synced_until, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(scope, account_id) DO UPDATE SET
+                    synced_until = excluded.synced_until,
+                    updated_at = excluded.updated_at
+                """,
+                (scope, account_id, synced_until, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,93 @@
+# repair_sync_state.py
+# 🔧 SỬA STATE CỤC BỘ: Đọc lại index (source key → page_id) từ Notion khi bị lệch
+#
+# Cách dùng:
+#     python repair_sync_state.py            # sửa cả campaigns + daily + facts
+#     python repair_sync_state.py daily      # chỉ database daily
+#     python repair_sync_state.py campaigns  # chỉ database campaigns
+#     python repair_sync_state.py facts      # database fact + các bảng FACT_ROLLUPS
+
+import argparse
+import os
+from dotenv import load_dotenv
+
+from module.notion_upsert import NotionUpserter
+from module.profiling import add_profile_argument, enable_profiling_from_args
+from module.sync_state import SyncStateStore
+
+# ========== LOAD CONFIGURATION FILES ==========
+
+load_dotenv(".env")
+load_dotenv(".env.config")
+
+# ========== CONFIGURATION ==========
+
+import sync_campaign_daily_facts
+import sync_dynamic_fields
+import sync_facebook_notion_daily
+
+NOTION_API_KEY = os.getenv('NOTION_API_KEY')
+
+# scope -> build_config của script sync (database + khóa giống hệt lúc ghi)
+TARGETS = {
+    'campaigns': sync_dynamic_fields.build_config,
+    'daily': sync_facebook_notion_daily.build_config,
+    'facts': sync_campaign_daily_facts.build_config,
+}
+
+def target_configs(name):
+    """(tên, config) của scope; facts kèm các bảng tổng hợp trong FACT_ROLLUPS"""
+    config = TARGETS[name]()
+    yield name, config
+    for kind, rollup_config in config.rollups.items():
+        yield f"{name} → {kind}", rollup_config
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild local sync state from Notion")
+    parser.add_argument('target', nargs='?', default='all', choices=['all'] + list(TARGETS))
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling_from_args(args)
+    
+    if not NOTION_API_KEY:
+        print("\n❌ LỖI: NOTION_API_KEY không có giá trị!")
+        return
+    
+    names = list(TARGETS) if args.target == 'all' else [args.target]
+    
+    print("\n" + "=" * 70)
+    print("🔧 REPAIR SYNC STATE")
+    print("=" * 70)
+    
+    repaired = set()
+    with SyncStateStore() as state:
+        for name, config in (target for scope in names for target in target_configs(scope)):
+            database_id, key_properties = config.database_id, config.key_properties
+            if not database_id:
+                print(f"\n⚠️ {name}: không có database ID - bỏ qua")
+                continue
+            # Bảng rollup của facts trùng database campaigns/daily -> chỉ nạp 1 lần
+            if (database_id, tuple(key_properties)) in repaired:
+                continue
+            repaired.add((database_id, tuple(key_properties)))
+            
+            print(f"\n📋 {name}: {database_id[:20]}... (khóa: {', '.join(key_properties)})")
+            upserter = NotionUpserter(None, database_id, key_properties, state)
+            count = upserter.rebuild_index(NOTION_API_KEY)
+            print(f"   ✅ Đã nạp {count} dòng vào {state.path}")
+            if upserter.duplicates:
+                print(f"   ⚠️ {len(upserter.duplicates)} dòng trùng khóa trên Notion")
+    
+    print("\n" + "=" * 70 + "\n")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⚠️ Dừng")
+    except Exception as e:
+        print(f"\n❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,139 @@
+# replay_dead_letters.py
+# 🔁 CHẠY LẠI CÁC LỆNH GHI NOTION THẤT BẠI (dead-letter queue)
+#
+# Cách dùng:
+#     python replay_dead_letters.py            # gửi lại toàn bộ
+#     python replay_dead_letters.py --dry-run  # chỉ liệt kê
+#
+# Lệnh vẫn lỗi sẽ được ghi lại vào dead-letter queue cho lần chạy sau.
+
+import argparse
+import os
+from collections import Counter
+from dotenv import load_dotenv
+
+from module.dead_letter import get_dead_letter_queue
+from module.log import ProgressLog, get_logger
+from module.metrics import get_metrics
+from module.notion_writer import NotionWriter
+from module.profiling import add_profile_argument, enable_profiling_from_args
+from module.sync_state import SyncStateStore
+
+# ========== LOAD CONFIGURATION FILES ==========
+
+load_dotenv(".env")
+load_dotenv(".env.config")
+
+# ========== CONFIGURATION ==========
+
+NOTION_API_KEY = os.getenv('NOTION_API_KEY')
+
+# ========== HELPERS ==========
+
+log = get_logger("replay_dead_letters")
+progress = ProgressLog(log, "🔁 Tiến độ replay")
+
+def superseded(state, entry):
+    """Lý do bỏ qua lệnh vì state đã mới hơn lệnh lỗi (None nếu vẫn cần gửi)
+
+    - "created": khóa chỉ được gửi lệnh tạo khi chưa có trong state, nên page_id có mặt lúc
+      này là do lần sync/replay sau đã tạo rồi (với số liệu mới hơn) -> tạo lại sẽ ra page trùng.
+    - "updated": dòng đã được ghi lại sau failed_at, hoặc fingerprint trong state khác lúc tính
+      diff (base_fingerprint) -> PATCH giá trị cũ sẽ đè số mới và state ghi nhận sai, lần sync
+      sau không sửa lại. Bỏ qua an toàn: state vẫn giữ giá trị Notion đang có, sync sau tự tính diff.
+    """
+    meta = entry.get('meta') or {}
+    if entry['action'] not in ('created', 'updated') or not meta.get('scope') or meta.get('source_key') is None:
+        return None
+    found = state.lookup(meta['scope'], [meta['source_key']]).get(meta['source_key'])
+    if found is None:
+        return None
+    if entry['action'] == 'created':
+        return f"khóa đã có page {found['page_id']}"
+    if found['synced_at'] and found['synced_at'] >= entry.get('failed_at', ''):
+        return f"dòng đã sync lại lúc {found['synced_at']}"
+    if 'base_fingerprint' in meta and found['fingerprint'] != meta['base_fingerprint']:
+        return "dòng đã đổi sau khi lỗi"
+    return None
+
+def log_write_result(action, label, ok):
+    progress.add(action if ok else "failed")
+    if ok:
+        log.debug(f"✅ {action}", label=label)
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay failed Notion writes from the dead-letter queue")
+    parser.add_argument('--dry-run', action='store_true', help="Chỉ liệt kê, không gửi")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling_from_args(args)
+
+    queue = get_dead_letter_queue()
+
+    print("\n" + "=" * 70)
+    print("🔁 REPLAY DEAD LETTERS")
+    print("=" * 70)
+    print(f"📁 {queue.path}: {queue.count()} lệnh")
+
+    if args.dry_run:
+        actions = Counter()
+        errors = Counter()
+        for entry in queue.peek():
+            actions[entry['action']] += 1
+            errors[entry.get('error', '')[:80]] += 1
+        for action, count in actions.most_common():
+            print(f"   • {action}: {count}")
+        for error, count in errors.most_common(5):
+            print(f"   ⚠️ {count}× {error}")
+        return
+
+    if not NOTION_API_KEY:
+        print("\n❌ LỖI: NOTION_API_KEY không có giá trị!")
+        return
+
+    total = 0
+    skipped = 0
+    # Writer có state -> lệnh thành công có meta {scope, source_key} được cập nhật vào state
+    with SyncStateStore() as state:
+        with NotionWriter(NOTION_API_KEY, on_done=log_write_result, state=state) as writer:
+            for index, entry in queue.claim():
+                total += 1
+                reason = superseded(state, entry)
+                if reason:
+                    skipped += 1
+                    log.debug(f"⏭️ Bỏ qua lệnh {entry['action']} - {reason}", label=entry.get('label', ''))
+                    queue.mark_done(index)
+                    continue
+                future = writer.submit(
+                    entry['action'], entry['method'], entry['path'], entry['payload'],
+                    entry.get('label', ''), entry.get('meta') or None,
+                )
+                # Lệnh lỗi đã được writer ghi lại vào queue trước khi future xong
+                future.add_done_callback(lambda _, index=index: queue.mark_done(index))
+    queue.finish_claim()
+
+    progress.close()
+    failed = writer.stats['failed']
+
+    print("\n" + "=" * 70)
+    print("✅ REPLAY HOÀN TẤT!")
+    print("=" * 70)
+    print(f"📊 Đã gửi lại: {total}")
+    print(f"✅ Thành công: {total - skipped - failed}")
+    print(f"⏭️  Bỏ qua (state đã mới hơn lệnh lỗi): {skipped}")
+    print(f"❌ Vẫn lỗi (đã ghi lại vào queue): {failed}")
+    print("=" * 70 + "\n")
+
+    get_metrics().emit(extra=dict(writer.stats, replayed=total, skipped=skipped))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⚠️ Dừng")
+    except Exception as e:
+        print(f"\n❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,85 @@
+# run_sync_jobs.py
+# 🗂️ CHẠY NHIỀU JOB SYNC TRONG 1 LẦN (nhiều nhóm account → nhiều database Notion)
+#
+# Cách dùng:
+#     python run_sync_jobs.py                              # đọc SYNC_JOBS_MANIFEST (mặc định sync_jobs.json)
+#     python run_sync_jobs.py --manifest jobs.json --only brand-a-daily,brand-b-daily
+#     python run_sync_jobs.py --max-parallel 4
+#
+# Manifest mẫu: sync_jobs.example.json. Các job chạy song song trên 1 pool thread,
+# dùng chung 1 ngân sách request Notion và 1 ngân sách Facebook (module/orchestrator.py).
+
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# ========== LOAD CONFIGURATION FILES ==========
+
+load_dotenv(".env")
+load_dotenv(".env.config")
+
+from module.orchestrator import load_manifest, run_jobs
+from module.profiling import add_profile_argument, enable_profiling_from_args
+from module.rate_governor import get_governor
+
+# ========== MAIN ==========
+
+def print_report(results):
+    print("\n" + "=" * 90)
+    print("🗂️  KẾT QUẢ CÁC JOB")
+    print("=" * 90)
+    print(f"{'job':<28}{'fetched':>9}{'created':>9}{'updated':>9}{'same':>7}{'archived':>10}{'failed':>8}{'giây':>8}")
+    print("-" * 90)
+    for name, result in results.items():
+        stats = result['stats']
+        if result['error']:
+            print(f"{name[:27]:<28}  ❌ {result['error'][:55]}")
+            continue
+        print(f"{name[:27]:<28}{stats.get('fetched', 0):>9}{stats.get('created', 0):>9}{stats.get('updated', 0):>9}"
+              f"{stats.get('unchanged', 0):>7}{stats.get('archived', 0):>10}{stats.get('failed', 0):>8}{result['seconds']:>8}")
+    print("-" * 90)
+    for key, budget in sorted(get_governor().utilisation().items()):
+        if ':' in key:
+            continue
+        print(f"📶 {key}: {budget['requests']} requests, bị throttle {budget['throttled']} lần, giữ lại vì usage cao {budget['held']} lần, rate hiện tại {budget['rate'] or '∞'}/s")
+    print("=" * 90 + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several Facebook → Notion sync jobs under one shared rate budget")
+    parser.add_argument('--manifest', default=os.getenv('SYNC_JOBS_MANIFEST', 'sync_jobs.json'))
+    parser.add_argument('--only', help="Chỉ chạy các job này (tên, cách nhau bằng dấu phẩy)")
+    parser.add_argument('--max-parallel', type=int, help="Ghi đè max_parallel trong manifest")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_profiling_from_args(args)
+
+    manifest = load_manifest(args.manifest)
+    if args.max_parallel:
+        manifest.max_parallel = args.max_parallel
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+
+    print("\n" + "=" * 70)
+    print(f"🗂️  SYNC JOBS: {len(manifest.jobs)} job, {manifest.max_parallel} chạy song song")
+    print("=" * 70)
+    for name, config in manifest.jobs.items():
+        if not only or name in only:
+            print(f"   • {name}: {len(config.account_ids)} accounts → {config.database_id[:20]}... ({config.sync_mode})")
+
+    results = run_jobs(manifest, only)
+    print_report(results)
+
+    # Exit code khác 0 để scheduler (GitHub Actions) báo lỗi
+    if any(result['error'] or result['stats'].get('failed') for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⚠️ Dừng")
+    except Exception as e:
+        print(f"\n❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,92 @@
+# sync_campaign_daily_facts.py
+# 📦 BẢNG FACT CAMPAIGN × NGÀY (1 lần fetch Graph cho cả 3 bảng)
+#
+# Lấy level=campaign, time_increment=1 một lần, upsert theo (Account ID, Campaign ID, Date).
+# FACT_ROLLUPS=daily,campaign: cộng dồn cục bộ từ cùng lần fetch rồi ghi luôn
+#   daily    -> NOTION_DATABASE_ID_DAILY (như sync_facebook_notion_daily.py)
+#   campaign -> NOTION_DATABASE_ID (tổng campaign như sync_dynamic_fields.py, cần DATE_MODE=static)
+# thay vì chạy 2 script kia (2 lượt Graph riêng).
+# Luồng xử lý dùng chung: module/pipeline.py
+
+import argparse
+from dotenv import load_dotenv
+
+from module.pipeline import run_pipeline
+from module.profiling import add_profile_argument, enable_profiling_from_args
+from module.sync_config import SyncConfig, env_list
+
+# ========== LOAD CONFIGURATION FILES ==========
+
+load_dotenv(".env")
+load_dotenv(".env.config")
+
+import sync_dynamic_fields
+import sync_facebook_notion_daily
+
+# ========== CONFIGURATION ==========
+
+DEFAULT_FIELD_MAPPINGS = {
+    'campaign_name': 'Campaign Name',
+    'spend': 'Spend',
+    'impressions': 'Impressions',
+    'clicks': 'Clicks',
+    'ctr': 'CTR (%)',
+    'cpc': 'CPC',
+}
+
+FACT_PROPERTIES = [
+    ('Account ID', 'account_id', 'rich_text'),
+    ('Campaign ID', 'campaign_id', 'rich_text'),
+    ('Date', 'date_start', 'date'),
+]
+
+# Rollup dùng mapping mặc định của script tương ứng, không dùng NOTION_FIELD_MAPPINGS:
+# mapping trong env là của 1 bảng khác (thường là daily, không có campaign_id/campaign_name)
+ROLLUP_CONFIGS = {
+    'daily': lambda: sync_facebook_notion_daily.build_config(sync_facebook_notion_daily.DEFAULT_FIELD_MAPPINGS),
+    'campaign': lambda: sync_dynamic_fields.build_config(sync_dynamic_fields.DEFAULT_FIELD_MAPPINGS),
+}
+
+def fact_label(record):
+    return f"{record.get('campaign_name', 'Unknown')[:40]} - {record.get('date_start', '')}"
+
+def build_config():
+    config = SyncConfig.from_env(
+        title="FACEBOOK ADS CAMPAIGN × NGÀY → NOTION",
+        database_env='NOTION_DATABASE_ID_FACTS',
+        key_properties=['Account ID', 'Campaign ID', 'Date'],
+        level='campaign',
+        default_fields='campaign_name,campaign_id,spend,impressions,clicks,ctr,cpc',
+        default_mappings=DEFAULT_FIELD_MAPPINGS,
+        title_field='campaign_name',
+        fixed_properties=FACT_PROPERTIES,
+        time_increment=1,
+        label=fact_label,
+    )
+    # FACEBOOK_FIELDS/NOTION_FIELD_MAPPINGS có thể đang là của daily -> luôn lấy thêm campaign
+    for field in ('campaign_id', 'campaign_name'):
+        if field not in config.facebook_fields:
+            config.facebook_fields.append(field)
+    config.field_mappings.setdefault('campaign_name', DEFAULT_FIELD_MAPPINGS['campaign_name'])
+    for kind in env_list('FACT_ROLLUPS'):
+        if kind not in ROLLUP_CONFIGS:
+            raise ValueError(f"FACT_ROLLUPS: '{kind}' không hợp lệ ({', '.join(ROLLUP_CONFIGS)})")
+        config.rollups[kind] = ROLLUP_CONFIGS[kind]()
+    return config
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Facebook Ads campaign × day facts (and local rollups) into Notion")
+    enable_profiling_from_args(add_profile_argument(parser).parse_args())
+    run_pipeline(build_config())
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⚠️ Dừng")
+    except Exception as e:
+        print(f"\n❌ Lỗi: {str(e)}")
+        import traceback
+        traceback.print_exc()
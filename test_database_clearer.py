@@ -3,23 +3,31 @@ Auto Delete - Notion Database Clearer (8 threads, no confirmation)
 
 Cách sử dụng:
     python test_database_clearer.py
+    python test_database_clearer.py --profile   # cProfile/tracemalloc/Chrome trace
 
 Tốc độ:
     - Sequential: 500 pages = 250 giây
     - 8 threads: 500 pages = 30-40 giây (8x nhanh!)
+    - Đo thật (mock server, không đụng production):
+      python benchmarks/run_benchmarks.py --ops archive --latency-ms 150
     
 ✅ Xóa luôn, không cần xác nhận!
 """
 
+import argparse
 import os
 from dotenv import load_dotenv
+from module.log import ProgressLog, get_logger
+from module.metrics import get_metrics
 from module.notion_database_clearer import NotionDatabaseClearer
-from concurrent.futures import ThreadPoolExecutor
+from module.profiling import add_profile_argument, enable_profiling_from_args
 import time
-import threading
 
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Archive every row of the daily Notion database")
+enable_profiling_from_args(add_profile_argument(parser).parse_args())
+
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 
 config = {}
@@ -45,53 +53,33 @@ print("🚀 Notion Database Clearer (Auto Mode)")
 print("=" * 60)
 
 clearer = NotionDatabaseClearer(NOTION_API_KEY)
-pages = clearer.get_all_pages(NOTION_DATABASE_ID_DAILY)
-total_pages = len(pages)
 
-print(f"📊 Tìm thấy: {total_pages} pages")
+print(f"⚡ Cấu hình: 8 threads, xóa ngay khi mỗi trang query về")
+print(f"⏱️  Bắt đầu xóa...\n")
+
+start_time = time.time()
+
+progress = ProgressLog(get_logger("test_database_clearer"), "🗑️ Tiến độ xóa")
+
+result = clearer.clear_database(
+    NOTION_DATABASE_ID_DAILY,
+    max_workers=8,
+    on_progress=lambda deleted, failed: progress.set(deleted=deleted, failed=failed),
+)
+progress.close()
+total_pages = result["total_pages"]
 
 if total_pages == 0:
     print("✅ Database đã trống!")
     exit(0)
 
-print(f"⚡ Cấu hình: 8 threads")
-print(f"⏱️  Bắt đầu xóa...\n")
-
-start_time = time.time()
-result_lock = threading.Lock()
-deleted_count = 0
-failed_count = 0
-
-def delete_worker(page_id):
-    global deleted_count, failed_count
-    try:
-        if clearer.delete_page(page_id):
-            with result_lock:
-                deleted_count += 1
-        else:
-            with result_lock:
-                failed_count += 1
-    except Exception:
-        with result_lock:
-            failed_count += 1
-
-with ThreadPoolExecutor(max_workers=8) as executor:
-    futures = [executor.submit(delete_worker, page["id"]) for page in pages]
-    
-    completed = 0
-    for future in futures:
-        future.result()
-        completed += 1
-        if completed % 50 == 0 or completed == total_pages:
-            elapsed = time.time() - start_time
-            rate = completed / elapsed if elapsed > 0 else 0
-            print(f"[{completed}/{total_pages}] ({100*completed//total_pages}%) {rate:.1f} pages/s")
-
 elapsed_time = time.time() - start_time
 
 print("\n" + "=" * 60)
 print("✅ Hoàn thành!")
 print("=" * 60)
-print(f"Tổng: {total_pages} | Thành công: {deleted_count} | Lỗi: {failed_count}")
+print(f"Tổng: {total_pages} | Thành công: {result['deleted_pages']} | Lỗi: {result['failed_pages']}")
 print(f"Thời gian: {elapsed_time:.1f}s | Tốc độ: {total_pages/elapsed_time:.1f} pages/s")
 print("=" * 60)
+
+get_metrics().emit(extra={"deleted": result["deleted_pages"], "failed": result["failed_pages"]})